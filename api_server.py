@@ -1,17 +1,25 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 import tempfile
 import os
+import orjson
+import time
+import hashlib
+import secrets
 import logging
-from datetime import datetime
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import aiofiles
 
-from config import Config
+from config import settings
 from document_processor import DocumentProcessor
-from llm_handler import OfflineLLM
+from llm_handler import OfflineLLM, create_async_client
+from response_cache import ResponseCache
+from text_extraction import extract_text_cached
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -21,7 +29,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Offline Chatbot API",
     description="A fast, deployable backend API for offline document-based and general chat",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS for frontend integration
@@ -33,11 +42,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+UPLOAD_CHUNK_BYTES = 1 << 20  # Read uploads 1MB at a time
+
 # Global instances
-config = Config()
 doc_processor = None
 llm_handler = None
-executor = ThreadPoolExecutor(max_workers=2)
+# One pool per workload so slow ingestion never queues ahead of retrieval.
+# LLM calls are async HTTP and only need a semaphore, not threads.
+retrieval_pool = ThreadPoolExecutor(max_workers=settings.RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+index_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index")  # Single writer for Chroma/int8 index
+# PDF/DOCX parsing is pure Python and GIL-bound, so it runs in separate processes.
+# "spawn" avoids forking a process that already holds torch/chromadb threads.
+ingest_pool = ProcessPoolExecutor(
+    max_workers=os.cpu_count(),
+    mp_context=multiprocessing.get_context("spawn")
+)
+response_cache = ResponseCache(db_path=settings.RESPONSE_CACHE_DB_PATH)
+inflight_requests: Dict[str, asyncio.Task] = {}
+inflight_lock = asyncio.Lock()
+generation_queue: Optional[asyncio.Queue] = None
+batcher_task: Optional[asyncio.Task] = None
+dispatch_tasks: Set[asyncio.Task] = set()  # Strong references so in-flight batches are never collected
+keep_alive_task: Optional[asyncio.Task] = None
+llm_semaphore: Optional[asyncio.Semaphore] = None
 
 # Pydantic models for API
 class ChatRequest(BaseModel):
@@ -58,11 +85,13 @@ class DocumentUploadResponse(BaseModel):
     processed: int
     failed: int
     total_chunks: int
+    skipped: int = 0
     errors: List[str] = []
 
 class HealthResponse(BaseModel):
     status: str
     ollama_available: bool
+    model_loaded: bool = False
     document_processor_available: bool
     total_documents: int
     message: str
@@ -70,20 +99,128 @@ class HealthResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
-    global doc_processor, llm_handler
+    global doc_processor, llm_handler, generation_queue, batcher_task, keep_alive_task, llm_semaphore
+    
+    os.makedirs(settings.get_upload_path(), exist_ok=True)
+    llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    
+    # Start the micro-batcher that feeds queued chat requests to the LLM
+    generation_queue = asyncio.Queue()
+    batcher_task = asyncio.create_task(batcher_loop())
     
     try:
         # Initialize document processor
         doc_processor = DocumentProcessor()
         logger.info("Document processor initialized")
         
-        # Initialize LLM handler
-        llm_handler = OfflineLLM()
+        # Initialize LLM handler with a pooled async client so generation never ties up threads
+        app.state.http = create_async_client()
+        llm_handler = OfflineLLM(async_client=app.state.http)
         logger.info("LLM handler initialized")
         
+        # Warm the embedding model/vector index and load the LLM in parallel
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(
+            loop.run_in_executor(retrieval_pool, doc_processor.search_similar_documents, "warmup", 1),
+            llm_handler.warmup()
+        )
+        logger.info("Models warmed up")
+        
+        # Keep re-pinning the model so Ollama never evicts it between bursts
+        keep_alive_task = asyncio.create_task(keep_model_loaded())
+        
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks, release connections and shut down worker pools."""
+    for task in (batcher_task, keep_alive_task):
+        if task:
+            task.cancel()
+    
+    # Let batches already sent to the LLM fail their waiters instead of vanishing
+    for task in list(dispatch_tasks):
+        task.cancel()
+    await asyncio.gather(*dispatch_tasks, return_exceptions=True)
+    
+    if llm_handler:
+        await llm_handler.aclose()
+        llm_handler.close()
+    
+    if getattr(app.state, "http", None):
+        await app.state.http.aclose()
+    
+    response_cache.close()
+    
+    for pool in (retrieval_pool, index_pool, ingest_pool):
+        pool.shutdown(wait=False)
+
+async def keep_model_loaded():
+    """Periodically refresh the model's keep_alive so it stays resident."""
+    while True:
+        await asyncio.sleep(settings.OLLAMA_KEEP_ALIVE_REFRESH_SECONDS)
+        await llm_handler.warmup()
+
+async def batcher_loop():
+    """Collect queued generation requests into micro-batches for the LLM."""
+    loop = asyncio.get_event_loop()
+    max_wait = settings.BATCH_MAX_WAIT_MS / 1000
+    
+    while True:
+        batch = [await generation_queue.get()]
+        deadline = loop.time() + max_wait
+        
+        # Keep draining until the batch is full or the wait window closes
+        while len(batch) < settings.BATCH_MAX_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(generation_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # Dispatch without blocking the next batch from forming
+        task = asyncio.create_task(dispatch_batch(batch))
+        dispatch_tasks.add(task)
+        task.add_done_callback(dispatch_tasks.discard)
+
+async def dispatch_batch(batch: List[tuple]):
+    """Run one batch through the LLM and resolve each waiting future."""
+    batch = [item for item in batch if not item[2].done()]
+    if not batch:
+        return
+    
+    logger.info(f"Dispatching batch of {len(batch)} generation request(s)")
+    
+    try:
+        async with llm_semaphore:
+            results = await llm_handler.generate_batch(
+                [prompt for prompt, _, _ in batch],
+                [context_docs for _, context_docs, _ in batch]
+            )
+    except asyncio.CancelledError:
+        # Shutdown: release the waiters rather than leaving them pending forever
+        for _, _, future in batch:
+            future.cancel()
+        raise
+    except Exception as e:
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+    
+    for (_, _, future), result in zip(batch, results):
+        if not future.done():
+            future.set_result(result)
+
+async def enqueue_generation(prompt: str, context_docs: Optional[List[Dict]]) -> Dict[str, Any]:
+    """Queue a prompt for the batcher and wait for its response."""
+    future = asyncio.get_event_loop().create_future()
+    await generation_queue.put((prompt, context_docs, future))
+    return await future
+
 @app.get("/", response_model=Dict[str, str])
 async def root():
     """Root endpoint with API information."""
@@ -98,13 +235,15 @@ async def root():
 async def health_check():
     """Health check endpoint."""
     ollama_available = False
+    model_loaded = False
     doc_processor_available = False
     total_documents = 0
     
     try:
         if llm_handler:
-            model_status = llm_handler.check_model_availability()
+            model_status = await llm_handler.acheck_model_availability()
             ollama_available = model_status.get("available", False)
+            model_loaded = await llm_handler.is_model_loaded()
         
         if doc_processor:
             doc_processor_available = True
@@ -119,61 +258,102 @@ async def health_check():
     return HealthResponse(
         status=status,
         ollama_available=ollama_available,
+        model_loaded=model_loaded,
         document_processor_available=doc_processor_available,
         total_documents=total_documents,
         message="API is running"
     )
 
+async def retrieve_documents(message: str, query_embedding, loop: asyncio.AbstractEventLoop) -> List[Dict]:
+    """Embed the query (unless already embedded) and fetch the top matching chunks."""
+    if query_embedding is None:
+        query_embedding = await loop.run_in_executor(retrieval_pool, doc_processor.embed_cached, message)
+    
+    return await loop.run_in_executor(
+        retrieval_pool,
+        doc_processor.query_by_vector,
+        query_embedding,
+        settings.RETRIEVAL_K
+    )
+
+async def generate_chat_reply(request: ChatRequest, loop: asyncio.AbstractEventLoop, query_embedding=None):
+    """Retrieve context (document mode) and generate the LLM reply for a chat request."""
+    if request.mode == "document":
+        if not doc_processor:
+            raise HTTPException(status_code=503, detail="Document processor not available")
+        
+        # Get relevant documents while Ollama makes sure the model is loaded
+        relevant_docs, _ = await asyncio.gather(
+            retrieve_documents(request.message, query_embedding, loop),
+            llm_handler.warmup()
+        )
+        
+        # Generate response with context
+        llm_response = await enqueue_generation(request.message, relevant_docs)
+        
+        sources = list(set([
+            doc.get("metadata", {}).get("source", "Unknown")
+            for doc in relevant_docs
+        ]))
+        
+    else:
+        # General chat - no document context
+        llm_response = await enqueue_generation(request.message, None)
+        relevant_docs = []
+        sources = []
+    
+    return llm_response, relevant_docs, sources
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """Main chat endpoint for both general and document-based chat."""
     if not llm_handler:
         raise HTTPException(status_code=503, detail="LLM service not available")
     
-    start_time = datetime.now()
-    conversation_id = request.conversation_id or f"conv_{int(start_time.timestamp())}"
+    start_time = time.perf_counter()
+    conversation_id = request.conversation_id or f"conv_{secrets.token_hex(8)}"
     
     try:
-        # Run the potentially slow LLM operation in thread pool
         loop = asyncio.get_event_loop()
         
-        if request.mode == "document":
-            if not doc_processor:
-                raise HTTPException(status_code=503, detail="Document processor not available")
-            
-            # Get relevant documents
-            relevant_docs = await loop.run_in_executor(
-                executor,
-                doc_processor.search_similar_documents,
-                request.message,
-                config.RETRIEVAL_K
-            )
-            
-            # Generate response with context
-            llm_response = await loop.run_in_executor(
-                executor,
-                llm_handler.generate_response,
-                request.message,
-                relevant_docs
+        # Serve repeated questions from the cache: exact match first, then near-duplicates
+        cache_key = response_cache.make_key(request.mode, request.message)
+        cached_response = response_cache.get(cache_key)
+        query_embedding = None
+        
+        if cached_response is None and doc_processor:
+            query_embedding = await loop.run_in_executor(
+                retrieval_pool,
+                doc_processor.embed_cached,
+                request.message
             )
-            
-            sources = list(set([
-                doc.get("metadata", {}).get("source", "Unknown")
-                for doc in relevant_docs
-            ]))
-            
-        else:
-            # General chat - no document context
-            llm_response = await loop.run_in_executor(
-                executor,
-                llm_handler.generate_response,
-                request.message,
-                None
+            cached_response = response_cache.get_similar(request.mode, query_embedding)
+        
+        if cached_response is not None:
+            return ChatResponse(
+                response=cached_response["response"],
+                mode=request.mode,
+                processing_time=time.perf_counter() - start_time,
+                conversation_id=conversation_id,
+                metadata={**cached_response["metadata"], "cached": True}
             )
-            relevant_docs = []
-            sources = []
         
-        processing_time = (datetime.now() - start_time).total_seconds()
+        # Coalesce concurrent duplicates: the first request starts one generation task
+        # that every identical request awaits. The task is shielded, so a caller that
+        # disconnects never cancels the work the others are waiting on.
+        async with inflight_lock:
+            inflight = inflight_requests.get(cache_key)
+            is_leader = inflight is None
+            if is_leader:
+                inflight = asyncio.create_task(generate_chat_reply(request, loop, query_embedding))
+                inflight_requests[cache_key] = inflight
+                inflight.add_done_callback(lambda task, key=cache_key: finish_inflight(key, task))
+            else:
+                logger.info("Joining in-flight request for identical message")
+        
+        llm_response, relevant_docs, sources = await asyncio.shield(inflight)
+        
+        processing_time = time.perf_counter() - start_time
         
         metadata = {
             "model": llm_response.get("model", "Unknown"),
@@ -183,7 +363,7 @@ async def chat_endpoint(request: ChatRequest):
             "success": llm_response.get("success", False)
         }
         
-        return ChatResponse(
+        chat_response = ChatResponse(
             response=llm_response["response"],
             mode=request.mode,
             processing_time=processing_time,
@@ -191,10 +371,75 @@ async def chat_endpoint(request: ChatRequest):
             metadata=metadata
         )
         
+        if is_leader and llm_response.get("success", False):
+            response_cache.put(cache_key, request.mode, chat_response.model_dump(), query_embedding)
+        
+        return chat_response
+        
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+def finish_inflight(cache_key: str, task: asyncio.Task):
+    """Forget a finished generation task and mark its error as retrieved."""
+    if inflight_requests.get(cache_key) is task:
+        del inflight_requests[cache_key]
+    if not task.cancelled():
+        task.exception()  # Waiters re-raise it; this only silences "never retrieved"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the chat reply as Server-Sent Events, token by token."""
+    if not llm_handler:
+        raise HTTPException(status_code=503, detail="LLM service not available")
+    
+    start_time = time.perf_counter()
+    conversation_id = request.conversation_id or f"conv_{secrets.token_hex(8)}"
+    loop = asyncio.get_event_loop()
+    
+    relevant_docs = []
+    sources = []
+    if request.mode == "document":
+        if not doc_processor:
+            raise HTTPException(status_code=503, detail="Document processor not available")
+        
+        relevant_docs, _ = await asyncio.gather(
+            retrieve_documents(request.message, None, loop),
+            llm_handler.warmup()
+        )
+        sources = list(set([
+            doc.get("metadata", {}).get("source", "Unknown")
+            for doc in relevant_docs
+        ]))
+    
+    async def event_stream():
+        final_chunk = {}
+        try:
+            async with llm_semaphore:
+                async for chunk in llm_handler.astream_response(request.message, relevant_docs or None):
+                    token = chunk.get("response", "")
+                    if token:
+                        yield f"data: {orjson.dumps({'token': token}).decode()}\n\n"
+                    if chunk.get("done"):
+                        final_chunk = chunk
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield f"event: error\ndata: {orjson.dumps({'detail': str(e)}).decode()}\n\n"
+            return
+        
+        metadata = {
+            "model": llm_handler.model,
+            "mode": request.mode,
+            "conversation_id": conversation_id,
+            "processing_time": time.perf_counter() - start_time,
+            "context_used": len(relevant_docs),
+            "response_tokens": final_chunk.get("eval_count", 0),
+            "sources": sources
+        }
+        yield f"event: done\ndata: {orjson.dumps(metadata).decode()}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.post("/upload-documents", response_model=DocumentUploadResponse)
 async def upload_documents(files: List[UploadFile] = File(...)):
     """Upload and process documents for document-based chat."""
@@ -204,39 +449,89 @@ async def upload_documents(files: List[UploadFile] = File(...)):
     try:
         # Create temporary directory for uploaded files
         with tempfile.TemporaryDirectory() as temp_dir:
-            file_paths = []
+            max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
             
-            # Save uploaded files
+            # Reject oversized files before reading anything
             for file in files:
-                if file.size > config.MAX_FILE_SIZE_MB * 1024 * 1024:
+                if file.size is not None and file.size > max_bytes:
                     raise HTTPException(
                         status_code=413, 
-                        detail=f"File {file.filename} too large (max {config.MAX_FILE_SIZE_MB}MB)"
+                        detail=f"File {file.filename} too large (max {settings.MAX_FILE_SIZE_MB}MB)"
                     )
-                
-                file_path = os.path.join(temp_dir, file.filename)
-                with open(file_path, "wb") as f:
-                    content = await file.read()
-                    f.write(content)
-                file_paths.append(file_path)
             
-            # Process documents in thread pool
             loop = asyncio.get_event_loop()
+            upload_semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+            
+            async def save_and_extract(index: int, file: UploadFile):
+                """Stream one upload to disk and extract its text in a worker process."""
+                async with upload_semaphore:
+                    # One subdirectory per upload: duplicate names cannot collide, and
+                    # basename() keeps path components from escaping temp_dir
+                    file_dir = os.path.join(temp_dir, str(index))
+                    os.makedirs(file_dir)
+                    file_name = os.path.basename(file.filename or "")
+                    file_path = os.path.join(file_dir, file_name if file_name not in ("", ".", "..") else "upload")
+                    content_hash = hashlib.blake2b()
+                    written = 0
+                    
+                    # Copy in 1MB chunks so only one chunk per file is held in memory
+                    async with aiofiles.open(file_path, "wb") as out:
+                        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                            written += len(chunk)
+                            if written > max_bytes:
+                                raise HTTPException(
+                                    status_code=413, 
+                                    detail=f"File {file.filename} too large (max {settings.MAX_FILE_SIZE_MB}MB)"
+                                )
+                            content_hash.update(chunk)
+                            await out.write(chunk)
+                    
+                    # Identical content is already embedded; skip parsing entirely
+                    digest = content_hash.hexdigest()
+                    if await loop.run_in_executor(retrieval_pool, doc_processor.is_indexed, digest):
+                        logger.info(f"Skipping {file.filename}: already indexed")
+                        return None
+                    
+                    text = await loop.run_in_executor(ingest_pool, extract_text_cached, file_path, digest)
+                    return file_path, text, digest
+            
+            # Save and parse all files concurrently. If one fails (e.g. 413), cancel and
+            # wait for the rest before the temp directory is removed under them.
+            tasks = [asyncio.ensure_future(save_and_extract(index, file)) for index, file in enumerate(files)]
+            try:
+                saved = await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            documents = [document for document in saved if document is not None]
+            skipped = len(saved) - len(documents)
+            
+            # Chunk, embed and store on the single index writer thread
             results = await loop.run_in_executor(
-                executor,
-                doc_processor.process_documents,
-                file_paths
+                index_pool,
+                doc_processor.process_extracted_documents,
+                documents
             )
+            results["skipped"] += skipped
+            
+            # Document answers may change once new content is indexed
+            if results["processed"] > 0:
+                response_cache.invalidate("document")
             
             return DocumentUploadResponse(
-                success=results["processed"] > 0,
-                message=f"Processed {results['processed']} documents successfully",
+                success=results["processed"] > 0 or results["skipped"] > 0,
+                message=f"Processed {results['processed']} documents successfully ({results['skipped']} already indexed)",
                 processed=results["processed"],
                 failed=results["failed"],
                 total_chunks=results["total_chunks"],
+                skipped=results["skipped"],
                 errors=results["errors"]
             )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Document upload error: {e}")
         raise HTTPException(status_code=500, detail=f"Document processing failed: {str(e)}")
@@ -249,7 +544,8 @@ async def clear_documents():
     
     try:
         loop = asyncio.get_event_loop()
-        await loop.run_in_executor(executor, doc_processor.clear_collection)
+        await loop.run_in_executor(index_pool, doc_processor.clear_collection)
+        response_cache.invalidate("document")
         return {"message": "All documents cleared successfully"}
     
     except Exception as e:
@@ -277,7 +573,7 @@ async def get_available_models():
         raise HTTPException(status_code=503, detail="LLM service not available")
     
     try:
-        model_info = llm_handler.check_model_availability()
+        model_info = await llm_handler.acheck_model_availability()
         return model_info
     
     except Exception as e:
@@ -1,13 +1,15 @@
 import streamlit as st
 import os
+import shutil
 import tempfile
+import time
 from pathlib import Path
 from typing import List, Dict, Any
 import logging
 from datetime import datetime
 
 # Import our custom modules
-from config import Config
+from config import settings
 from document_processor import DocumentProcessor
 from llm_handler import OfflineLLM
 
@@ -17,8 +19,8 @@ logger = logging.getLogger(__name__)
 
 # Page configuration
 st.set_page_config(
-    page_title=Config.PAGE_TITLE,
-    page_icon=Config.PAGE_ICON,
+    page_title=settings.PAGE_TITLE,
+    page_icon=settings.PAGE_ICON,
     layout="wide",
     initial_sidebar_state="expanded"
 )
@@ -55,11 +57,40 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def format_message_parts(message: Dict[str, Any]) -> Dict[str, str]:
+    """Build the mode badge and metadata markdown shown around a chat message."""
+    parts = {}
+    role = message["role"]
+    
+    # Mode indicator for user messages
+    if role == "user" and "mode" in message:
+        mode_icon = "📄" if message["mode"] == "📄 Document Chat" else "💬"
+        parts["mode"] = f'<div class="mode-indicator">{mode_icon} {message["mode"]}</div>'
+    
+    # Metadata for assistant messages
+    if role == "assistant" and "metadata" in message:
+        metadata = message["metadata"]
+        parts["details_left"] = "  \n".join([
+            f"**Mode:** {metadata.get('mode', 'Unknown')}",
+            f"**Context Used:** {metadata.get('context_used', 0)} chunks",
+            f"**Model:** {metadata.get('model', 'Unknown')}",
+        ])
+        parts["details_right"] = "  \n".join([
+            f"**Response Tokens:** {metadata.get('response_tokens', 0)}",
+            f"**Processing Time:** {metadata.get('processing_time', 0):.2f}s",
+        ])
+        
+        # Source information is only shown for document mode
+        if metadata.get("sources") and metadata.get('mode') == "📄 Document Chat":
+            parts["sources"] = "**Sources:**  \n" + "  \n".join(f"• {source}" for source in metadata["sources"])
+    
+    return parts
+
 class ChatbotApp:
     """Main Streamlit application for the offline chatbot."""
     
     def __init__(self):
-        self.config = Config()
+        self.config = settings
         self.initialize_session_state()
         self.doc_processor = self.get_doc_processor()
         self.llm_handler = self.get_llm_handler()
@@ -183,8 +214,7 @@ class ChatbotApp:
         
         # Show file details
         for file in uploaded_files:
-            file_size_mb = len(file.read()) / (1024 * 1024)
-            file.seek(0)  # Reset file pointer
+            file_size_mb = file.size / (1024 * 1024)
             
             if file_size_mb > self.config.MAX_FILE_SIZE_MB:
                 st.warning(f"⚠️ {file.name} is too large ({file_size_mb:.1f}MB > {self.config.MAX_FILE_SIZE_MB}MB)")
@@ -207,8 +237,9 @@ class ChatbotApp:
             # Save uploaded files to temporary directory
             for uploaded_file in uploaded_files:
                 file_path = os.path.join(temp_dir, uploaded_file.name)
+                uploaded_file.seek(0)
                 with open(file_path, "wb") as f:
-                    f.write(uploaded_file.read())
+                    shutil.copyfileobj(uploaded_file, f, length=1 << 20)
                 file_paths.append(file_path)
             
             # Process documents
@@ -224,6 +255,9 @@ class ChatbotApp:
                         st.info(f"📊 Created {results['total_chunks']} text chunks")
                         st.info("📄 You can now use Document Chat mode!")
                     
+                    if results.get("skipped", 0) > 0:
+                        st.info(f"♻️ Skipped {results['skipped']} document(s) that were already processed")
+                    
                     if results["failed"] > 0:
                         st.warning(f"⚠️ Failed to process {results['failed']} document(s)")
                         
@@ -325,35 +359,22 @@ class ChatbotApp:
     
     def display_message(self, message: Dict[str, Any]):
         """Display a chat message."""
+        parts = format_message_parts(message)
+        
         with st.chat_message(message["role"]):
-            # Show mode indicator for user messages
-            if message["role"] == "user" and "mode" in message:
-                mode_icon = "📄" if message["mode"] == "📄 Document Chat" else "💬"
-                st.markdown(f'<div class="mode-indicator">{mode_icon} {message["mode"]}</div>', unsafe_allow_html=True)
+            if "mode" in parts:
+                st.markdown(parts["mode"], unsafe_allow_html=True)
             
-            st.write(message["content"])
+            st.markdown(message["content"])
             
-            # Show metadata for assistant messages
-            if message["role"] == "assistant" and "metadata" in message:
-                metadata = message["metadata"]
-                
+            if "details_left" in parts:
                 with st.expander("ℹ️ Response Details"):
                     col1, col2 = st.columns(2)
+                    col1.markdown(parts["details_left"])
+                    col2.markdown(parts["details_right"])
                     
-                    with col1:
-                        st.write(f"**Mode:** {metadata.get('mode', 'Unknown')}")
-                        st.write(f"**Context Used:** {metadata.get('context_used', 0)} chunks")
-                        st.write(f"**Model:** {metadata.get('model', 'Unknown')}")
-                    
-                    with col2:
-                        st.write(f"**Response Tokens:** {metadata.get('response_tokens', 0)}")
-                        st.write(f"**Processing Time:** {metadata.get('processing_time', 0):.2f}s")
-                    
-                    # Show source information if available (only for document mode)
-                    if metadata.get("sources") and metadata.get('mode') == "📄 Document Chat":
-                        st.write("**Sources:**")
-                        for source in metadata["sources"]:
-                            st.write(f"• {source}")
+                    if "sources" in parts:
+                        st.markdown(parts["sources"])
     
     def handle_user_input(self, user_input: str, chat_mode: str = "💬 General Chat"):
         """Handle user input and generate response."""
@@ -369,57 +390,70 @@ class ChatbotApp:
             "mode": chat_mode
         })
         
-        # Generate response
-        with st.spinner("Thinking..."):
-            start_time = datetime.now()
+        # Show the question right away; the answer streams in below it
+        self.display_message(st.session_state.chat_history[-1])
+        
+        start_time = time.perf_counter()
+        
+        try:
+            relevant_docs = []
             
-            try:
-                relevant_docs = []
-                
-                # Only search documents if in document chat mode AND documents are available
-                if chat_mode == "📄 Document Chat" and self.doc_processor and st.session_state.documents_processed:
+            # Only search documents if in document chat mode AND documents are available
+            if chat_mode == "📄 Document Chat" and self.doc_processor and st.session_state.documents_processed:
+                with st.spinner("Searching documents..."):
                     relevant_docs = self.doc_processor.search_similar_documents(
                         user_input, 
                         k=self.config.RETRIEVAL_K
                     )
-                
-                # Generate LLM response (with or without document context)
-                context_docs = relevant_docs if chat_mode == "📄 Document Chat" else None
-                llm_response = self.llm_handler.generate_response(user_input, context_docs=context_docs)
-                
-                processing_time = (datetime.now() - start_time).total_seconds()
-                
-                # Prepare response metadata
-                sources = []
-                if relevant_docs and chat_mode == "📄 Document Chat":
-                    sources = list(set([
-                        doc.get("metadata", {}).get("source", "Unknown")
-                        for doc in relevant_docs
-                    ]))
-                
-                metadata = {
-                    "context_used": len(relevant_docs) if chat_mode == "📄 Document Chat" else 0,
-                    "model": llm_response.get("model", "Unknown"),
-                    "response_tokens": llm_response.get("response_tokens", 0),
-                    "processing_time": processing_time,
-                    "sources": sources,
-                    "success": llm_response.get("success", False),
-                    "mode": chat_mode
-                }
-                
-                # Add assistant response to chat history
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": llm_response["response"],
-                    "timestamp": datetime.now(),
-                    "metadata": metadata
-                })
-                
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"Error generating response: {e}")
-                logger.error(f"Response generation error: {e}")
+            
+            # Stream LLM response (with or without document context)
+            context_docs = relevant_docs if chat_mode == "📄 Document Chat" else None
+            final_chunk = {}
+            
+            def token_stream():
+                # Repeat questions over the same context replay the cached answer
+                for chunk in self.llm_handler.generate_response_stream(user_input, context_docs=context_docs, cacheable=True):
+                    if chunk.get("done"):
+                        final_chunk.update(chunk)
+                    yield chunk.get("response", "")
+            
+            with st.chat_message("assistant"):
+                response_text = st.write_stream(token_stream())
+            
+            processing_time = time.perf_counter() - start_time
+            
+            # Prepare response metadata
+            sources = []
+            if relevant_docs and chat_mode == "📄 Document Chat":
+                sources = list(set([
+                    doc.get("metadata", {}).get("source", "Unknown")
+                    for doc in relevant_docs
+                ]))
+            
+            metadata = {
+                "context_used": len(relevant_docs) if chat_mode == "📄 Document Chat" else 0,
+                "model": self.llm_handler.model,
+                "response_tokens": final_chunk.get("eval_count", 0),
+                "processing_time": processing_time,
+                "sources": sources,
+                "success": True,
+                "mode": chat_mode
+            }
+            
+            # Add assistant response to chat history
+            response_text = response_text.strip()
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": response_text,
+                "timestamp": datetime.now(),
+                "metadata": metadata
+            })
+            
+            st.rerun()
+            
+        except Exception as e:
+            st.error(f"Error generating response: {e}")
+            logger.error(f"Response generation error: {e}")
     
     def run(self):
         """Run the main application."""
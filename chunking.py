@@ -0,0 +1,36 @@
+from typing import Iterable, List
+
+# Helpers for carrying overlap between chunks produced by chunkers that do not
+# overlap on their own (e.g. FastChunker). Kept free of heavy imports.
+
+def overlap_tail(text: str, max_chars: int) -> str:
+    """Last whole words of text within max_chars, so overlap never starts mid-word."""
+    if max_chars <= 0 or not text:
+        return ""
+    if len(text) <= max_chars:
+        return text
+
+    tail = text[-max_chars:]
+    if tail[0].isspace() or text[-max_chars - 1].isspace():
+        return tail.strip()
+
+    # Drop the partial first word; no whitespace at all means no whole word fits
+    parts = tail.split(None, 1)
+    return parts[1].strip() if len(parts) > 1 else ""
+
+def add_overlap(pieces: Iterable[str], overlap: int) -> List[str]:
+    """Prefix each piece with up to `overlap` characters (tail plus joining space) of the previous one.
+
+    Pieces should be cut at chunk_size - overlap, so every overlapped chunk still fits in chunk_size.
+    """
+    chunks = []
+    previous = ""
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        tail = overlap_tail(previous, overlap - 1)  # Leave room for the joining space
+        chunks.append(f"{tail} {piece}" if tail else piece)
+        previous = piece
+
+    return chunks
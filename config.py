@@ -1,52 +1,132 @@
 import os
-from typing import Optional
+from dataclasses import dataclass, fields
+from typing import Any, Tuple, Union
 
-class Config:
-    """Configuration settings for the offline chatbot."""
+ENV_PREFIX = "CHATBOT_"
+
+@dataclass(frozen=True)
+class Settings:
+    """Configuration settings for the offline chatbot.
+    
+    Loaded once at import; any field can be overridden with a CHATBOT_-prefixed
+    environment variable, e.g. CHATBOT_RETRIEVAL_K=8.
+    """
     
     # Database settings
-    CHROMA_DB_PATH = "./chroma_db"
-    COLLECTION_NAME = "document_embeddings"
+    CHROMA_DB_PATH: str = "./chroma_db"
+    COLLECTION_NAME: str = "document_embeddings"
     
     # Model settings
-    EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-    LLM_MODEL = "llama3.1:8b"  # Best model for document Q&A
-    OLLAMA_BASE_URL = "http://localhost:11434"
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    LLM_MODEL: str = "llama3.1:8b"  # Best model for document Q&A
+    LLM_TEMPERATURE: float = 0.7  # Sampling temperature; 0 makes answers deterministic
+    LLM_SEED: int = 42  # Seed used when sampling is deterministic (temperature 0)
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_KEEP_ALIVE: Union[int, str] = -1  # Keep the model loaded indefinitely (-1) instead of unloading when idle
+    OLLAMA_KEEP_ALIVE_REFRESH_SECONDS: int = 240  # Re-pin the model every 4 minutes
+    OLLAMA_TIMEOUT_SECONDS: int = 120  # Timeout for async generate calls
+    OLLAMA_STATUS_TTL_SECONDS: int = 30  # Reuse /api/tags results for health checks this long
+    OLLAMA_MAX_CONNECTIONS: int = 64  # Max concurrent connections to Ollama
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 40  # Idle connections kept open for reuse
+    OLLAMA_HTTP2: bool = True  # Negotiate HTTP/2 when h2 is installed and Ollama is served over TLS
+    OLLAMA_NUM_GPU: int = 999  # Layers offloaded to the GPU; 999 means all that fit
+    OLLAMA_NUM_THREAD: int = 0  # CPU threads for inference; 0 lets Ollama pick (physical cores)
+    OLLAMA_NUM_BATCH: int = 512  # Prompt tokens evaluated per batch during prefill
     
     # API settings
-    API_HOST = "0.0.0.0"
-    API_PORT = 8000
-    API_RELOAD = True
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
+    API_RELOAD: bool = True
     
     # Document processing
-    CHUNK_SIZE = 1000
-    CHUNK_OVERLAP = 200
-    MAX_FILE_SIZE_MB = 10
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    USE_FAST_CHUNKER: bool = True  # Use chonkie's FastChunker when installed
+    MAX_FILE_SIZE_MB: int = 10
+    UPLOAD_PATH: str = "./uploaded_docs"
+    EXTRACT_CACHE_PATH: str = "./.cache/extracts"  # Extracted text by content hash; empty disables
+    EXTRACT_CACHE_SIZE_MB: int = 512  # Disk budget for the extracted-text cache
+    UPLOAD_CONCURRENCY: int = 8  # Files saved and parsed concurrently per upload
+    EMBEDDING_BATCH_SIZE: int = 64  # Chunks per forward pass when embedding uploads
+    EMBEDDING_FP16: bool = True  # Half-precision embedding forward pass (CUDA only)
+    CHROMA_ADD_BATCH_SIZE: int = 5000  # Max chunks per ChromaDB add call
     
     # Retrieval settings
-    RETRIEVAL_K = 5  # Number of relevant chunks to retrieve
-    SIMILARITY_THRESHOLD = 0.7
+    RETRIEVAL_K: int = 5  # Number of relevant chunks to retrieve
+    CONTEXT_DOC_TOKENS: int = 128  # Tokens of each retrieved chunk included in the prompt
+    # Local dir holding tiktoken's cl100k_base file (tiktoken is optional). Nothing is ever
+    # downloaded: when this is empty, the file is missing or tiktoken is not installed,
+    # token counts fall back to about 4 characters per token
+    TIKTOKEN_CACHE_DIR: str = ""
+    SIMILARITY_THRESHOLD: float = 0.7
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096  # Max cached query embeddings
+    
+    # Vector index (HNSW) settings
+    HNSW_M: int = 32  # Graph connectivity; higher improves recall at the cost of memory
+    HNSW_CONSTRUCTION_EF: int = 200  # Build-time candidate list size
+    HNSW_SEARCH_EF: int = 64  # Query-time candidate list size; raise for recall, lower for latency
+    HNSW_BATCH_SIZE: int = 10000  # Vectors buffered in memory before being added to the graph
+    HNSW_SYNC_THRESHOLD: int = 100000  # Vectors added between index persists to disk (>= batch size)
+    USE_INT8_INDEX: bool = True  # Shortlist candidates on a calibrated int8 copy of the embeddings
+    INT8_SHORTLIST_FACTOR: int = 4  # Candidates re-ranked at full precision per requested result
+    
+    # Response cache settings
+    RESPONSE_CACHE_SIZE: int = 512  # Max cached chat responses
+    RESPONSE_CACHE_TTL_SECONDS: int = 600  # Cached responses expire after 10 minutes
+    RESPONSE_CACHE_SIMILARITY: float = 0.92  # Min cosine similarity for a near-duplicate hit
+    RESPONSE_CACHE_DB_PATH: str = "./.cache/chat_responses.db"  # SQLite copy of the chat response cache; empty disables
+    
+    # Request batching settings
+    BATCH_MAX_SIZE: int = 8  # Max chat requests dispatched to the LLM together
+    BATCH_MAX_WAIT_MS: int = 30  # How long to wait for a batch to fill
+    
+    # Concurrency settings
+    LLM_MAX_CONCURRENCY: int = 2  # Max batches/streams sent to Ollama at once
+    LLM_BATCH_CONCURRENCY: int = 8  # Max requests in flight within one generate_batch call
+    RETRIEVAL_WORKERS: int = 8  # Threads for query embedding and vector search
     
     # UI settings
-    PAGE_TITLE = "Offline Chatbot"
-    PAGE_ICON = "🤖"
-    SIDEBAR_TITLE = "Document Management"
+    PAGE_TITLE: str = "Offline Chatbot"
+    PAGE_ICON: str = "🤖"
+    SIDEBAR_TITLE: str = "Document Management"
     
     # Supported file types
-    SUPPORTED_FILE_TYPES = ['.pdf', '.docx', '.txt']
+    SUPPORTED_FILE_TYPES: Tuple[str, ...] = ('.pdf', '.docx', '.txt')
     
     # Security settings
-    ENABLE_FILE_VALIDATION = True
-    MAX_DOCUMENTS = 100
+    ENABLE_FILE_VALIDATION: bool = True
+    MAX_DOCUMENTS: int = 100
     
-    @classmethod
-    def get_ollama_url(cls) -> str:
+    def get_ollama_url(self) -> str:
         """Get the Ollama base URL."""
-        return cls.OLLAMA_BASE_URL
+        return self.OLLAMA_BASE_URL
+    
+    def get_upload_path(self) -> str:
+        """Get the path for uploaded documents (created once at startup)."""
+        return self.UPLOAD_PATH
     
     @classmethod
-    def get_upload_path(cls) -> str:
-        """Get the path for uploaded documents."""
-        upload_path = "./uploaded_docs"
-        os.makedirs(upload_path, exist_ok=True)
-        return upload_path
+    def from_env(cls) -> "Settings":
+        """Build settings from defaults plus CHATBOT_* environment overrides."""
+        overrides = {}
+        for field in fields(cls):
+            raw = os.environ.get(ENV_PREFIX + field.name)
+            if raw is not None:
+                overrides[field.name] = _parse_env_value(raw, field.type)
+        return cls(**overrides)
+
+def _parse_env_value(raw: str, field_type: Any) -> Any:
+    """Convert an environment string to the field's declared type."""
+    if field_type is bool:
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if field_type is int:
+        return int(raw)
+    if field_type is float:
+        return float(raw)
+    if field_type == Tuple[str, ...]:
+        return tuple(item.strip() for item in raw.split(",") if item.strip())
+    if field_type == Union[int, str]:
+        return int(raw) if raw.lstrip("-").isdigit() else raw
+    return raw
+
+settings = Settings.from_env()
@@ -4,7 +4,7 @@ Deployment script for the Offline Chatbot API
 """
 import os
 import sys
-import subprocess
+import asyncio
 import argparse
 from pathlib import Path
 
@@ -15,32 +15,64 @@ def check_python_version():
         sys.exit(1)
     print(f"✅ Python {sys.version} detected")
 
-def install_requirements():
+WHEELHOUSE = Path("wheels")
+PIP_CACHE_DIR = Path.home() / ".cache" / "chatbot-pip"
+
+async def run_command(*cmd, env=None):
+    """Run a command without blocking the event loop; returns (returncode, stdout, stderr)."""
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env
+    )
+    stdout, stderr = await process.communicate()
+    return process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+async def install_requirements() -> bool:
     """Install required packages."""
     print("📦 Installing requirements...")
-    try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], 
-                      check=True, capture_output=True, text=True)
-        print("✅ Requirements installed successfully")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to install requirements: {e}")
-        print(f"Output: {e.stdout}")
-        print(f"Error: {e.stderr}")
-        sys.exit(1)
+    
+    # Keep downloaded wheels between deploys, unless the caller chose a cache already
+    env = dict(os.environ)
+    env.setdefault("PIP_CACHE_DIR", str(PIP_CACHE_DIR))
+    pip_install = [sys.executable, "-m", "pip", "install", "--prefer-binary", "-r", "requirements.txt"]
+    
+    # Try a local wheelhouse first (pip wheel -r requirements.txt -w wheels), then the index
+    if WHEELHOUSE.is_dir():
+        returncode, stdout, stderr = await run_command(
+            *pip_install, "--no-index", f"--find-links={WHEELHOUSE}", env=env
+        )
+        if returncode == 0:
+            print(f"✅ Requirements installed from {WHEELHOUSE}/")
+            return True
+        print("⚠️  Wheelhouse incomplete, falling back to the package index")
+    
+    returncode, stdout, stderr = await run_command(*pip_install, env=env)
+    if returncode != 0:
+        print(f"❌ Failed to install requirements (exit code {returncode})")
+        print(f"Output: {stdout}")
+        print(f"Error: {stderr}")
+        return False
+    
+    print("✅ Requirements installed successfully")
+    return True
 
-def check_ollama():
+async def check_ollama():
     """Check if Ollama is installed and running."""
     print("🤖 Checking Ollama...")
     try:
         # Check if ollama command exists
-        subprocess.run(["ollama", "--version"], check=True, capture_output=True)
+        returncode, _, _ = await run_command("ollama", "--version")
+        if returncode != 0:
+            raise FileNotFoundError("ollama")
         print("✅ Ollama is installed")
         
         # Check if service is running
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        if result.returncode == 0:
+        returncode, stdout, _ = await run_command("ollama", "list")
+        if returncode == 0:
             print("✅ Ollama service is running")
-            models = result.stdout.strip()
+            models = stdout.strip()
             if models:
                 print(f"📋 Available models:\n{models}")
             else:
@@ -49,10 +81,19 @@ def check_ollama():
         else:
             print("⚠️  Ollama service may not be running. Try: ollama serve")
             
-    except subprocess.CalledProcessError:
+    except (FileNotFoundError, PermissionError):
         print("❌ Ollama not found. Please install from https://ollama.ai/")
         print("After installation, run: ollama pull llama3.1:8b")
 
+async def prepare_environment(skip_install: bool) -> bool:
+    """Install requirements and check Ollama concurrently; both are I/O-bound."""
+    tasks = [check_ollama()]
+    if not skip_install:
+        tasks.append(install_requirements())
+    
+    results = await asyncio.gather(*tasks)
+    return all(result is not False for result in results)
+
 def create_docker_files():
     """Create Docker configuration files."""
     print("🐳 Creating Docker configuration...")
@@ -67,9 +108,13 @@ RUN apt-get update && apt-get install -y \\
     curl \\
     && rm -rf /var/lib/apt/lists/*
 
-# Copy requirements and install Python dependencies
+# Install heavy, stable dependencies first so their layer survives app dependency changes
+COPY requirements-base.txt .
+RUN pip install --no-cache-dir --prefer-binary -r requirements-base.txt
+
+# Then the lighter, more volatile dependencies
 COPY requirements.txt .
-RUN pip install --no-cache-dir -r requirements.txt
+RUN pip install --no-cache-dir --prefer-binary -r requirements.txt
 
 # Copy application code
 COPY . .
@@ -100,7 +145,7 @@ services:
       - ./chroma_db:/app/chroma_db
       - ./uploaded_docs:/app/uploaded_docs
     environment:
-      - OLLAMA_BASE_URL=http://host.docker.internal:11434
+      - CHATBOT_OLLAMA_BASE_URL=http://host.docker.internal:11434
     extra_hosts:
       - "host.docker.internal:host-gateway"
     restart: unless-stopped
@@ -148,25 +193,26 @@ node_modules/
 def create_env_file():
     """Create environment configuration file."""
     env_content = """# Offline Chatbot Configuration
+# Every setting in config.py can be overridden with a CHATBOT_-prefixed variable
 
 # API Settings
-API_HOST=0.0.0.0
-API_PORT=8000
-API_RELOAD=true
+CHATBOT_API_HOST=0.0.0.0
+CHATBOT_API_PORT=8000
+CHATBOT_API_RELOAD=true
 
 # Ollama Settings
-OLLAMA_BASE_URL=http://localhost:11434
-LLM_MODEL=llama3.1:8b
+CHATBOT_OLLAMA_BASE_URL=http://localhost:11434
+CHATBOT_LLM_MODEL=llama3.1:8b
 
 # Database Settings
-CHROMA_DB_PATH=./chroma_db
-COLLECTION_NAME=document_embeddings
+CHATBOT_CHROMA_DB_PATH=./chroma_db
+CHATBOT_COLLECTION_NAME=document_embeddings
 
 # Document Processing
-CHUNK_SIZE=1000
-CHUNK_OVERLAP=200
-MAX_FILE_SIZE_MB=10
-RETRIEVAL_K=5
+CHATBOT_CHUNK_SIZE=1000
+CHATBOT_CHUNK_OVERLAP=200
+CHATBOT_MAX_FILE_SIZE_MB=10
+CHATBOT_RETRIEVAL_K=5
 
 # Security (configure for production)
 ALLOWED_ORIGINS=["*"]
@@ -256,10 +302,9 @@ def main():
     
     check_python_version()
     
-    if not args.skip_install:
-        install_requirements()
+    if not asyncio.run(prepare_environment(args.skip_install)):
+        sys.exit(1)
     
-    check_ollama()
     create_env_file()
     
     if args.docker:
@@ -1,34 +1,157 @@
 import os
 import logging
-from typing import List, Dict, Any
-from pathlib import Path
-import PyPDF2
-from docx import Document
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import numpy as np
+import torch
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import uuid
+try:
+    from chonkie import FastChunker  # Optional SIMD-accelerated chunker
+except ImportError:
+    FastChunker = None
 from datetime import datetime
 
-from config import Config
+from chunking import add_overlap
+from config import settings
+from quantized_index import Int8Index
+import text_extraction
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Query embeddings shared by every DocumentProcessor in the process, so they
+# survive processor re-creation (e.g. Streamlit cache resets). Keyed by
+# (model name, query digest) so switching models never returns stale vectors.
+_query_embedding_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+_query_embedding_lock = threading.Lock()
+
+SPLIT_WINDOW_CHARS = 64 * 1024  # Text handed to the recursive splitter at a time
+IN_PROCESS_EXTRACT_MAX_FILES = 2  # Batches this small are parsed in-process; spawning workers costs more
+
+# Loaded embedding models, one per model name per process
+_MODEL_CACHE: Dict[str, SentenceTransformer] = {}
+_model_cache_lock = threading.Lock()
+
+def get_embedding_model(name: str) -> SentenceTransformer:
+    """Return the process-wide SentenceTransformer for a model name, loading and warming it once."""
+    with _model_cache_lock:
+        model = _MODEL_CACHE.get(name)
+        if model is not None:
+            return model
+        
+        model = SentenceTransformer(name)
+        if settings.EMBEDDING_FP16 and model.device.type == "cuda":
+            model.half()  # fp16 kernels are only a win on GPU
+        
+        # Run one forward pass so lazy kernel/tokenizer setup is not paid by the first request
+        model.encode(["warmup"], normalize_embeddings=True)
+        logger.info(f"Loaded embedding model: {name}")
+        
+        _MODEL_CACHE[name] = model
+        return model
+
+# Extraction workers, spawned on first use and reused by every later upload.
+# "spawn" avoids forking a process that already holds torch/chromadb threads.
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """Return the process-wide text extraction pool, creating it once."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _extract_pool
+
+def _discard_extract_pool(pool: ProcessPoolExecutor):
+    """Forget a broken pool so the next upload spawns fresh workers."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is pool:
+            _extract_pool = None
+    pool.shutdown(wait=False)
+
 class DocumentProcessor:
     """Handles document processing, embedding generation, and vector storage."""
     
     def __init__(self):
-        self.config = Config()
-        self.embedding_model = SentenceTransformer(self.config.EMBEDDING_MODEL)
+        self.config = settings
+        torch.set_num_threads(os.cpu_count() or 1)  # Use every core for batched embedding
+        self.embedding_model = get_embedding_model(self.config.EMBEDDING_MODEL)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.config.CHUNK_SIZE,
             chunk_overlap=self.config.CHUNK_OVERLAP,
             length_function=len,
         )
+        self.fast_chunker = self._create_fast_chunker()
         self._initialize_vector_db()
+        self._initialize_int8_index()
+    
+    def _create_fast_chunker(self):
+        """Create the SIMD chunker if enabled and installed; None means use the text splitter."""
+        if not self.config.USE_FAST_CHUNKER or FastChunker is None:
+            return None
+        
+        try:
+            # chunk_size is in bytes; CHUNK_SIZE is in characters, which match for ASCII text.
+            # Leave room for the overlap that split_text prepends to every chunk.
+            return FastChunker(
+                chunk_size=self.config.CHUNK_SIZE - self.config.CHUNK_OVERLAP,
+                delimiters="\n\n.?!"
+            )
+        except Exception as e:
+            logger.warning(f"FastChunker unavailable, falling back to text splitter: {e}")
+            return None
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into overlapping chunks."""
+        if self.fast_chunker is None:
+            return list(self.split_text_stream(self._text_windows(text)))
+        
+        # FastChunker does not overlap, so carry the tail of each chunk into the next
+        return add_overlap((chunk.text for chunk in self.fast_chunker.chunk(text)), self.config.CHUNK_OVERLAP)
+    
+    def split_text_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Split a stream of text pieces, holding only a window plus the trailing chunk in memory.
+        
+        Pieces must be contiguous (e.g. pages or windows cut at newlines). After each
+        window the last chunk is carried over so it can grow or overlap into the next.
+        """
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            if len(buffer) < SPLIT_WINDOW_CHARS:
+                continue
+            
+            chunks = self.text_splitter.split_text(buffer)
+            yield from chunks[:-1]
+            buffer = chunks[-1] if chunks else ""
+        
+        if buffer:
+            yield from self.text_splitter.split_text(buffer)
+    
+    @staticmethod
+    def _text_windows(text: str) -> Iterator[str]:
+        """Yield contiguous slices of about SPLIT_WINDOW_CHARS, each starting at a newline."""
+        start = 0
+        while start < len(text):
+            end = text.find("\n", start + SPLIT_WINDOW_CHARS)
+            if end == -1:
+                end = len(text)
+            yield text[start:end]
+            start = end
     
     def _initialize_vector_db(self):
         """Initialize ChromaDB vector database."""
@@ -41,176 +164,377 @@ class DocumentProcessor:
             # Get or create collection
             self.collection = self.chroma_client.get_or_create_collection(
                 name=self.config.COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self._collection_metadata()
             )
             logger.info(f"Vector database initialized: {self.config.CHROMA_DB_PATH}")
         except Exception as e:
             logger.error(f"Failed to initialize vector database: {e}")
             raise
     
+    def _initialize_int8_index(self):
+        """Load the int8 sidecar index and rebuild it if it drifted from ChromaDB."""
+        self.int8_index = None
+        self._int8_lock = threading.Lock()
+        if not self.config.USE_INT8_INDEX:
+            return
+        
+        self.int8_index = Int8Index(os.path.join(self.config.CHROMA_DB_PATH, "int8_index"))
+        count = self.collection.count()
+        if len(self.int8_index) == count:
+            return
+        
+        self._rebuild_int8_index(count)
+    
+    def _rebuild_int8_index(self, count: int):
+        """Re-quantize the int8 index from ChromaDB's full-precision embeddings."""
+        logger.info(f"Rebuilding int8 index from {count} stored embeddings")
+        self.int8_index.clear()
+        # The first page calibrates the ranges, so keep it at least the calibration sample
+        page_size = max(self.config.CHROMA_ADD_BATCH_SIZE, Int8Index.MIN_CALIBRATION_ROWS)
+        for offset in range(0, count, page_size):
+            page = self.collection.get(include=["embeddings"], limit=page_size, offset=offset)
+            self.int8_index.add(page["ids"], np.asarray(page["embeddings"], dtype=np.float32))
+    
+    def _collection_metadata(self) -> Dict[str, Any]:
+        """HNSW index settings for the collection (embeddings are normalized, so cosine == dot)."""
+        return {
+            "hnsw:space": "cosine",
+            "hnsw:M": self.config.HNSW_M,
+            "hnsw:construction_ef": self.config.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": self.config.HNSW_SEARCH_EF,
+            # Bulk uploads are buffered and persisted in large steps rather than per add call
+            "hnsw:batch_size": self.config.HNSW_BATCH_SIZE,
+            "hnsw:sync_threshold": self.config.HNSW_SYNC_THRESHOLD
+        }
+    
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF file."""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                return text.strip()
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF {file_path}: {e}")
-            return ""
+        return text_extraction.extract_text_from_pdf(file_path)
     
     def extract_text_from_docx(self, file_path: str) -> str:
         """Extract text from DOCX file."""
-        try:
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text.strip()
-        except Exception as e:
-            logger.error(f"Error extracting text from DOCX {file_path}: {e}")
-            return ""
+        return text_extraction.extract_text_from_docx(file_path)
     
     def extract_text_from_txt(self, file_path: str) -> str:
         """Extract text from TXT file."""
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                return file.read().strip()
-        except Exception as e:
-            logger.error(f"Error extracting text from TXT {file_path}: {e}")
-            return ""
+        return text_extraction.extract_text_from_txt(file_path)
     
     def extract_text_from_file(self, file_path: str) -> str:
         """Extract text from supported file formats."""
-        file_extension = Path(file_path).suffix.lower()
-        
-        if file_extension == '.pdf':
-            return self.extract_text_from_pdf(file_path)
-        elif file_extension == '.docx':
-            return self.extract_text_from_docx(file_path)
-        elif file_extension == '.txt':
-            return self.extract_text_from_txt(file_path)
-        else:
-            logger.warning(f"Unsupported file format: {file_extension}")
-            return ""
+        return text_extraction.extract_text_from_file(file_path)
     
     def process_documents(self, file_paths: List[str]) -> Dict[str, Any]:
         """Process multiple documents and store embeddings."""
+        if not file_paths:
+            return self.process_extracted_documents([])
+        
+        # Hash files concurrently (hashlib releases the GIL) so indexed content is skipped before parsing
+        with ThreadPoolExecutor(max_workers=min(8, len(file_paths))) as pool:
+            content_hashes = list(pool.map(text_extraction.file_content_hash, file_paths))
+        
+        pending = []
+        for file_path, content_hash in zip(file_paths, content_hashes):
+            if self.is_indexed(content_hash):
+                logger.info(f"Skipping {file_path}: already indexed")
+                continue
+            pending.append((file_path, content_hash))
+        
+        # Parsing is pure Python and GIL-bound, so larger batches extract in the
+        # shared worker pool. Embedding and the ChromaDB writes stay in this process.
+        paths = [path for path, _ in pending]
+        hashes = [content_hash for _, content_hash in pending]
+        if len(pending) <= IN_PROCESS_EXTRACT_MAX_FILES:
+            texts = list(map(text_extraction.extract_text_cached, paths, hashes))
+        else:
+            pool = get_extract_pool()
+            try:
+                texts = list(pool.map(text_extraction.extract_text_cached, paths, hashes))
+            except BrokenProcessPool:
+                _discard_extract_pool(pool)
+                raise
+        
+        documents = [(path, text, content_hash) for (path, content_hash), text in zip(pending, texts)]
+        results = self.process_extracted_documents(documents)
+        results["skipped"] += len(file_paths) - len(pending)
+        return results
+    
+    def process_extracted_documents(self, documents: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+        """Chunk, embed and store (file_path, text, content_hash) tuples whose text was already extracted."""
         results = {
             "processed": 0,
             "failed": 0,
             "total_chunks": 0,
+            "skipped": 0,
             "errors": []
         }
         
-        for file_path in file_paths:
+        # Extract and chunk every file first so all chunks can be embedded in one batch
+        all_chunks = []
+        all_metadatas = []
+        prepared_files = []
+        
+        seen_hashes = set()
+        
+        for file_path, text, content_hash in documents:
             try:
-                # Extract text
-                text = self.extract_text_from_file(file_path)
+                # Identical files within the same batch are only indexed once
+                if content_hash in seen_hashes:
+                    results["skipped"] += 1
+                    continue
+                seen_hashes.add(content_hash)
+                
                 if not text:
                     results["failed"] += 1
                     results["errors"].append(f"No text extracted from {file_path}")
                     continue
                 
                 # Split into chunks
-                chunks = self.text_splitter.split_text(text)
+                chunks = self.split_text(text)
                 if not chunks:
                     results["failed"] += 1
                     results["errors"].append(f"No chunks created from {file_path}")
                     continue
                 
-                # Generate embeddings and store
-                self._store_document_chunks(
+                all_chunks.extend(chunks)
+                all_metadatas.extend(self._build_chunk_metadatas(
                     chunks=chunks,
-                    source_file=file_path,
                     metadata={
                         "source": os.path.basename(file_path),
                         "file_path": file_path,
+                        "content_hash": content_hash,
                         "processed_at": datetime.now().isoformat(),
                         "chunk_count": len(chunks)
                     }
-                )
-                
-                results["processed"] += 1
-                results["total_chunks"] += len(chunks)
-                logger.info(f"Processed {file_path}: {len(chunks)} chunks")
+                ))
+                prepared_files.append((file_path, len(chunks)))
                 
             except Exception as e:
                 results["failed"] += 1
                 results["errors"].append(f"Error processing {file_path}: {str(e)}")
                 logger.error(f"Error processing {file_path}: {e}")
         
+        if not all_chunks:
+            return results
+        
+        # Generate embeddings and store
+        try:
+            self._store_document_chunks(all_chunks, all_metadatas)
+        except Exception as e:
+            for file_path, _ in prepared_files:
+                results["failed"] += 1
+                results["errors"].append(f"Error processing {file_path}: {str(e)}")
+            return results
+        
+        for file_path, chunk_count in prepared_files:
+            results["processed"] += 1
+            results["total_chunks"] += chunk_count
+            logger.info(f"Processed {file_path}: {chunk_count} chunks")
+        
         return results
     
-    def _store_document_chunks(self, chunks: List[str], source_file: str, metadata: Dict):
+    def is_indexed(self, content_hash: str) -> bool:
+        """Check whether a file with this content hash is already in the collection."""
+        try:
+            existing = self.collection.get(where={"content_hash": content_hash}, limit=1, include=[])
+            return bool(existing["ids"])
+        except Exception as e:
+            logger.error(f"Error checking content hash: {e}")
+            return False
+    
+    def _build_chunk_metadatas(self, chunks: List[str], metadata: Dict) -> List[Dict]:
+        """Build per-chunk metadata from a file's shared metadata."""
+        metadatas = []
+        
+        for i, chunk in enumerate(chunks):
+            chunk_metadata = metadata.copy()
+            chunk_metadata.update({
+                "chunk_index": i,
+                "chunk_text": chunk[:200] + "..." if len(chunk) > 200 else chunk
+            })
+            metadatas.append(chunk_metadata)
+        
+        return metadatas
+    
+    def _store_document_chunks(self, chunks: List[str], metadatas: List[Dict]):
         """Store document chunks with embeddings in vector database."""
         try:
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(chunks).tolist()
+            # Content-derived ids make re-adding an already stored chunk a no-op, and
+            # unlike uuid4 they need no random bytes from the OS per chunk
+            ids, chunks, metadatas = self._dedupe_chunks(chunks, metadatas)
+            if not chunks:
+                logger.info("All chunks already stored, nothing to embed")
+                return
             
-            # Prepare data for storage
-            ids = [str(uuid.uuid4()) for _ in chunks]
-            metadatas = []
+            # Generate embeddings for every chunk in a single batched call
+            embeddings = self.embedding_model.encode(
+                chunks,
+                batch_size=self.config.EMBEDDING_BATCH_SIZE,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            ).astype(np.float32, copy=False)
             
-            for i, chunk in enumerate(chunks):
-                chunk_metadata = metadata.copy()
-                chunk_metadata.update({
-                    "chunk_index": i,
-                    "chunk_text": chunk[:200] + "..." if len(chunk) > 200 else chunk
-                })
-                metadatas.append(chunk_metadata)
+            # Store in ChromaDB in as few calls as its per-call batch limit allows
+            batch_size = self._add_batch_size()
+            for start in range(0, len(chunks), batch_size):
+                end = start + batch_size
+                self.collection.add(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=chunks[start:end],
+                    metadatas=metadatas[start:end]
+                )
             
-            # Store in ChromaDB
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=chunks,
-                metadatas=metadatas
-            )
+            if self.int8_index is not None:
+                with self._int8_lock:
+                    self.int8_index.add(ids, embeddings)
+                    if self.int8_index.needs_calibration:
+                        self._rebuild_int8_index(self.collection.count())
             
         except Exception as e:
-            logger.error(f"Error storing chunks for {source_file}: {e}")
+            logger.error(f"Error storing {len(chunks)} chunks: {e}")
             raise
     
+    def _dedupe_chunks(self, chunks: List[str], metadatas: List[Dict]) -> Tuple[List[str], List[str], List[Dict]]:
+        """Give chunks content-hash ids and drop those repeated in the batch or already stored."""
+        ids, unique_chunks, unique_metadatas = [], [], []
+        seen = set()
+        for chunk, metadata in zip(chunks, metadatas):
+            chunk_id = hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).hexdigest()
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            ids.append(chunk_id)
+            unique_chunks.append(chunk)
+            unique_metadatas.append(metadata)
+        
+        existing = set()
+        batch_size = self._add_batch_size()
+        for start in range(0, len(ids), batch_size):
+            existing.update(self.collection.get(ids=ids[start:start + batch_size], include=[])["ids"])
+        
+        if existing:
+            logger.info(f"Skipping {len(existing)} chunks that are already stored")
+            keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+            ids = [ids[i] for i in keep]
+            unique_chunks = [unique_chunks[i] for i in keep]
+            unique_metadatas = [unique_metadatas[i] for i in keep]
+        
+        return ids, unique_chunks, unique_metadatas
+    
+    def _add_batch_size(self) -> int:
+        """Chunks per collection.add call, capped at the client's own batch limit."""
+        batch_size = self.config.CHROMA_ADD_BATCH_SIZE
+        try:
+            return min(batch_size, self.chroma_client.get_max_batch_size())
+        except Exception:
+            return batch_size  # Older clients do not expose a limit
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Generate an L2-normalized embedding for a single query."""
+        return self.embedding_model.encode(query, normalize_embeddings=True)
+    
+    def embed_cached(self, query: str) -> np.ndarray:
+        """Embed a query, reusing the embedding of a previously seen (normalized) query."""
+        digest = hashlib.blake2b(query.lower().strip().encode("utf-8"), digest_size=16).hexdigest()
+        key = (self.config.EMBEDDING_MODEL, digest)
+        
+        with _query_embedding_lock:
+            embedding = _query_embedding_cache.get(key)
+            if embedding is not None:
+                _query_embedding_cache.move_to_end(key)
+                return embedding
+        
+        embedding = self.embed_query(query)
+        embedding.setflags(write=False)  # Shared between callers, so keep it immutable
+        
+        with _query_embedding_lock:
+            _query_embedding_cache[key] = embedding
+            if len(_query_embedding_cache) > self.config.QUERY_EMBEDDING_CACHE_SIZE:
+                _query_embedding_cache.popitem(last=False)
+        
+        return embedding
+    
     def search_similar_documents(self, query: str, k: int = None) -> List[Dict]:
         """Search for similar documents using vector similarity."""
+        try:
+            # Generate query embedding
+            query_embedding = self.embed_cached(query)
+        except Exception as e:
+            logger.error(f"Error embedding query: {e}")
+            return []
+        
+        return self.query_by_vector(query_embedding, k)
+    
+    def query_by_vector(self, query_embedding: np.ndarray, k: int = None) -> List[Dict]:
+        """Search for similar documents using a precomputed query embedding."""
         if k is None:
             k = self.config.RETRIEVAL_K
         
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode([query]).tolist()[0]
+            if self.int8_index is not None and len(self.int8_index) == self.collection.count():
+                return self._query_int8(query_embedding, k)
             
             # Search in vector database
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=np.asarray(query_embedding, dtype=np.float32).reshape(1, -1),
                 n_results=k,
                 include=["documents", "metadatas", "distances"]
             )
             
-            # Format results
-            formatted_results = []
-            if results["documents"]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results["documents"][0],
-                    results["metadatas"][0],
-                    results["distances"][0]
-                )):
-                    formatted_results.append({
-                        "content": doc,
-                        "metadata": metadata,
-                        "similarity_score": 1 - distance,  # Convert distance to similarity
-                        "rank": i + 1
-                    })
+            if not results["documents"]:
+                return []
+            
+            # Convert all distances to similarities in one vectorized step
+            similarities = (1.0 - np.asarray(results["distances"][0], dtype=np.float32)).tolist()
+            ids, documents, metadatas = results["ids"][0], results["documents"][0], results["metadatas"][0]
             
-            return formatted_results
+            return [
+                {
+                    "id": ids[i],
+                    "content": documents[i],
+                    "metadata": metadatas[i],
+                    "similarity_score": similarities[i],
+                    "rank": i + 1
+                }
+                for i in range(len(ids))
+            ]
             
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
             return []
     
+    def _query_int8(self, query_embedding: np.ndarray, k: int) -> List[Dict]:
+        """Shortlist candidates on the int8 index, then re-rank them with full-precision embeddings."""
+        with self._int8_lock:
+            candidate_ids = self.int8_index.search(query_embedding, k * self.config.INT8_SHORTLIST_FACTOR)
+        if not candidate_ids:
+            return []
+        
+        candidates = self.collection.get(
+            ids=candidate_ids,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        
+        # Stored embeddings are normalized, so the dot product is the cosine similarity
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        similarities = np.asarray(candidates["embeddings"], dtype=np.float32) @ query
+        
+        order = np.argsort(-similarities)[:k].tolist()
+        scores = similarities[order].tolist()
+        ids, documents, metadatas = candidates["ids"], candidates["documents"], candidates["metadatas"]
+        
+        return [
+            {
+                "id": ids[i],
+                "content": documents[i],
+                "metadata": metadatas[i],
+                "similarity_score": score,
+                "rank": rank
+            }
+            for rank, (i, score) in enumerate(zip(order, scores), 1)
+        ]
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the document collection."""
         try:
@@ -231,8 +555,11 @@ class DocumentProcessor:
             self.chroma_client.delete_collection(name=self.config.COLLECTION_NAME)
             self.collection = self.chroma_client.get_or_create_collection(
                 name=self.config.COLLECTION_NAME,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self._collection_metadata()
             )
+            if self.int8_index is not None:
+                with self._int8_lock:
+                    self.int8_index.clear()
             logger.info("Collection cleared successfully")
         except Exception as e:
             logger.error(f"Error clearing collection: {e}")
@@ -1,28 +1,208 @@
+import asyncio
+import hashlib
+import heapq
 import logging
+import os
+import re
+import time
 import requests
-import json
-from typing import List, Dict, Any, Optional
-from config import Config
+from requests.adapters import HTTPAdapter
+import urllib3
+import httpx
+try:
+    import h2  # noqa: F401  # HTTP/2 support for httpx (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+import orjson
+from string import Template
+from typing import List, Dict, Any, Mapping, Optional, Iterator, AsyncIterator, Tuple
+try:
+    import tiktoken  # Token-accurate truncation of context documents
+except ImportError:
+    tiktoken = None
+from config import settings
+from response_cache import ResponseCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# System prompts, compiled once. The system message carries everything that is
+# stable across questions, so Ollama can reuse its KV cache for that prefix.
+GENERAL_SYSTEM = "You are a helpful AI assistant. Answer concisely."
+DOCUMENT_SYSTEM = Template(
+    "You are an AI assistant that answers questions based on provided documents. "
+    "Be concise and reference the documents when relevant.\n"
+    "\n\nRelevant information:\n$context"
+)
+MAX_CONTEXT_DOCS = 3  # Limit to top 3 for speed
+# Role labels the model sometimes echoes at the end of an answer
+TRAILING_ROLE_RE = re.compile(r"\s*(?:User:|Human:|Assistant:)\s*$")
+STREAM_TAIL_CHARS = 16  # Streamed text held back so a trailing role label can still be trimmed
+MAX_PREFIX_COUNTS = 256  # Distinct system prefixes whose token counts are remembered
+PROMPT_HEADROOM_TOKENS = 128  # Room left in num_ctx for the user question and chat template
+JSON_HEADERS = {"Content-Type": "application/json"}  # Request bodies are pre-serialized with orjson
+
+def create_async_client(base_url: str = None) -> httpx.AsyncClient:
+    """Create the pooled async client used for Ollama calls."""
+    return httpx.AsyncClient(
+        base_url=base_url or settings.get_ollama_url(),
+        http2=settings.OLLAMA_HTTP2 and HTTP2_AVAILABLE,  # Used when Ollama sits behind a TLS proxy
+        timeout=httpx.Timeout(settings.OLLAMA_TIMEOUT_SECONDS, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=30.0
+        )
+    )
+
+# Parsed /api/tags bodies by Ollama URL: (expires_at, tags). Module-level so new
+# handler instances and status polling share it.
+_tags_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+TIKTOKEN_BPE_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """Load the tiktoken encoding once, only from a local BPE cache; None means use the heuristic.
+    
+    tiktoken downloads missing BPE files with no timeout, which must never happen
+    in an offline app, so the cache directory is opt-in and checked up front.
+    cl100k is not Llama's tokenizer, so counts stay approximate either way.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        cache_dir = settings.TIKTOKEN_CACHE_DIR
+        if tiktoken is None or not cache_dir:
+            return None
+        
+        # tiktoken names cached files by the SHA-1 of their download URL
+        cached_file = os.path.join(cache_dir, hashlib.sha1(TIKTOKEN_BPE_URL.encode("utf-8")).hexdigest())
+        if not os.path.exists(cached_file):
+            logger.warning(f"No cached cl100k_base BPE file in {cache_dir}, estimating tokens from length")
+            return None
+        
+        os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable, estimating tokens from length: {e}")
+    return _encoding
+
+def _log_transfer(endpoint: str, headers: Mapping[str, str], body: bytes):
+    """At DEBUG, log how a response travelled, to see what Accept-Encoding saves."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "%s: %d bytes decoded, %s bytes on the wire (Content-Encoding: %s)",
+            endpoint,
+            len(body),
+            headers.get("Content-Length", "?"),
+            headers.get("Content-Encoding", "identity")
+        )
+
+def _hold_tail(text: str, done: bool) -> Tuple[str, str]:
+    """Split streamed text into the part safe to emit now and the tail held back.
+    
+    The held tail (plus any trailing whitespace) is released on the done chunk,
+    with TRAILING_ROLE_RE applied, so streamed answers match generate_response.
+    """
+    if done:
+        return TRAILING_ROLE_RE.sub("", text), ""
+    cut = max(len(text.rstrip()) - STREAM_TAIL_CHARS, 0)
+    return text[:cut], text[cut:]
+
+def _doc_score(doc: Dict) -> float:
+    return doc.get("similarity_score", 0.0)
+
+def estimate_tokens(text: str) -> int:
+    """Token count of text, or a rough estimate (about 4 characters per token) without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
 class OfflineLLM:
     """Handles communication with local LLM via Ollama."""
     
-    def __init__(self):
-        self.config = Config()
+    def __init__(self, async_client: Optional[httpx.AsyncClient] = None):
+        self.config = settings
         self.base_url = self.config.get_ollama_url()
         self.model = self.config.LLM_MODEL
+        self._async_client = async_client
+        self._owns_async_client = async_client is None
+        self.session = self._create_session()
+        self._http = self._create_pool_manager()
+        
+        # In-memory cache of finished generations, used only when a caller opts in
+        # (cacheable=True) or sampling is deterministic (temperature 0)
+        self._generation_cache = ResponseCache()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._prefix_token_counts: Dict[str, int] = {}
+        
+        # Options never change at runtime, so build them once and share them between
+        # requests; the shared dicts are read-only by convention
+        self._base_options = self._build_base_options()
+        self._options_by_keep: Dict[int, Dict[str, Any]] = {}
+        self._doc_token_budget = self._context_doc_budget()
         self._check_ollama_connection()
     
+    def _create_session(self) -> requests.Session:
+        """Create a pooled session so sync calls reuse TCP connections to Ollama."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "User-Agent": "offline-chatbot/1.0"
+        })
+        return session
+    
+    def _create_pool_manager(self) -> urllib3.PoolManager:
+        """Bare urllib3 pool for the tiny status GETs, skipping the requests wrapper."""
+        return urllib3.PoolManager(
+            num_pools=1,
+            maxsize=10,
+            block=False,
+            retries=False,
+            headers={
+                "Accept-Encoding": "gzip, deflate",
+                "User-Agent": "offline-chatbot/1.0"
+            }
+        )
+    
+    def close(self):
+        """Close the pooled sync session and status connections."""
+        self.session.close()
+        self._http.clear()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
     def _check_ollama_connection(self) -> bool:
         """Check if Ollama is running and accessible."""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
+            status_code, tags = self._fetch_tags()
+            if status_code == 200:
+                models = tags.get("models", [])
                 model_names = [model["name"].split(":")[0] for model in models]
                 
                 if self.model not in model_names:
@@ -32,146 +212,452 @@ class OfflineLLM:
                 logger.info(f"Ollama connection successful. Model '{self.model}' available.")
                 return True
             else:
-                logger.error(f"Ollama not accessible. Status code: {response.status_code}")
+                logger.error(f"Ollama not accessible. Status code: {status_code}")
                 return False
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, orjson.JSONDecodeError) as e:
             logger.error(f"Failed to connect to Ollama: {e}")
             return False
     
-    def generate_response(self, prompt: str, context_docs: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    def generate_response(self, prompt: str, context_docs: Optional[List[Dict]] = None,
+                          cacheable: bool = False) -> Dict[str, Any]:
         """Generate response using local LLM with optional context."""
         try:
-            # Build the enhanced prompt with context
-            enhanced_prompt = self._build_context_prompt(prompt, context_docs)
-            
-            # Debug logging
-            logger.info(f"Context docs provided: {context_docs is not None}")
-            logger.info(f"Number of context docs: {len(context_docs) if context_docs else 0}")
-            if not context_docs:
-                logger.info("Using GENERAL CHAT mode - no documents")
-            
-            # Prepare request payload with optimized settings for speed
-            payload = {
-                "model": self.model,
-                "prompt": enhanced_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "num_predict": 256,  # Reduced for faster responses
-                    "num_ctx": 2048,     # Context window
-                    "stop": ["User:", "Human:"],
-                    "repeat_penalty": 1.1,
-                    "seed": -1,
-                    "tfs_z": 1.0,
-                    "num_keep": 0,
-                    "typical_p": 1.0,
-                    "presence_penalty": 0.0,
-                    "frequency_penalty": 0.0,
-                    "mirostat": 0,
-                    "mirostat_tau": 5.0,
-                    "mirostat_eta": 0.1,
-                    "penalize_newline": True,
-                    "numa": False
-                }
-            }
+            # Stream the generation and join it, so nothing waits on one buffered body
+            pieces = []
+            raw = {}
+            for chunk in self.generate_response_stream(prompt, context_docs, cacheable=cacheable):
+                pieces.append(chunk.get("response", ""))
+                raw = chunk  # The final done=True chunk carries the token counts
             
-            # Make request to Ollama with reduced timeout for faster responses
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=30  # Reduced from 60 seconds
-            )
+            raw["response"] = "".join(pieces)
+            result = self._format_result(raw, context_docs)
+            if raw.get("cached"):
+                result["cached"] = True
+            return result
             
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "success": True,
-                    "response": result.get("response", "").strip(),
-                    "model": self.model,
-                    "context_used": len(context_docs) if context_docs else 0,
-                    "prompt_tokens": result.get("prompt_eval_count", 0),
-                    "response_tokens": result.get("eval_count", 0)
-                }
-            else:
-                logger.error(f"LLM request failed. Status: {response.status_code}")
-                return {
-                    "success": False,
-                    "error": f"HTTP {response.status_code}: {response.text}",
-                    "response": "Sorry, I encountered an error while generating a response."
-                }
-                
-        except requests.exceptions.Timeout:
-            logger.error("LLM request timed out")
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"LLM request failed. Status: {e.response.status_code}")
+            self.invalidate_status_cache()
             return {
                 "success": False,
-                "error": "Request timed out",
-                "response": "Sorry, the request took too long to process. Please try again."
+                "error": f"HTTP {e.response.status_code}: {e.response.text}",
+                "response": "Sorry, I encountered an error while generating a response."
             }
+        except requests.exceptions.Timeout:
+            logger.error("LLM request timed out")
+            return self._timeout_result()
         except Exception as e:
             logger.error(f"Error generating LLM response: {e}")
+            return self._error_result(e)
+    
+    def generate_response_stream(self, prompt: str, context_docs: Optional[List[Dict]] = None,
+                                 cacheable: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yield Ollama's streamed chunks; the final chunk has done=True and token counts.
+        
+        With cacheable=True (or at temperature 0) a repeat of the same request is
+        replayed from memory as a single done chunk marked cached=True.
+        """
+        payload = self._build_payload(prompt, context_docs, stream=True)
+        cache_key = None
+        if cacheable or payload["options"].get("temperature") == 0:
+            cache_key = self._generation_cache_key(payload)
+            cached = self._generation_cache.get(cache_key)
+            if cached is not None:
+                self.cache_hits += 1
+                yield {**cached, "cached": True}
+                return
+            self.cache_misses += 1
+        
+        pieces = []
+        for chunk in self._stream_chat(payload):
+            pieces.append(chunk["response"])
+            if chunk.get("done") and cache_key is not None:
+                # Only complete generations are stored; errors and abandoned streams never reach here
+                self._generation_cache.put(cache_key, "generation", {
+                    "done": True,
+                    "response": "".join(pieces),
+                    "prompt_eval_count": chunk.get("prompt_eval_count", 0),
+                    "eval_count": chunk.get("eval_count", 0)
+                })
+            yield chunk
+    
+    def _generation_cache_key(self, payload: Dict[str, Any]) -> str:
+        """Hash everything that determines a generation: model, messages and options."""
+        key_data = {"m": self.model, "p": payload["messages"], "o": payload["options"]}
+        return hashlib.sha256(orjson.dumps(key_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    
+    def _stream_chat(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """POST a streaming chat payload and parse the NDJSON reply line by line."""
+        with self.session.post(
+            f"{self.base_url}/api/chat",
+            data=orjson.dumps(payload),
+            headers=JSON_HEADERS,
+            stream=True,
+            timeout=30  # Applies per read, so long answers are fine as long as tokens keep coming
+        ) as response:
+            if response.status_code != 200:
+                _ = response.content  # Read Ollama's error body before the stream is closed
+                response.raise_for_status()
+            # Ollama sends chunked NDJSON, so each HTTP chunk is handed over as soon as it arrives
+            held = ""
+            for line in response.iter_lines(chunk_size=65536):
+                if line:
+                    chunk = self._chat_chunk(orjson.loads(line))
+                    chunk["response"], held = _hold_tail(held + chunk["response"], chunk.get("done", False))
+                    yield chunk
+    
+    async def astream_response(self, prompt: str, context_docs: Optional[List[Dict]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of generate_response_stream."""
+        payload = self._build_payload(prompt, context_docs, stream=True)
+        
+        async with self.async_client.stream("POST", "/api/chat", content=orjson.dumps(payload), headers=JSON_HEADERS) as response:
+            if response.status_code != 200:
+                await response.aread()
+                response.raise_for_status()
+            
+            # Ollama streams one JSON object per line
+            held = ""
+            async for line in response.aiter_lines():
+                if line:
+                    chunk = self._chat_chunk(orjson.loads(line))
+                    chunk["response"], held = _hold_tail(held + chunk["response"], chunk.get("done", False))
+                    yield chunk
+    
+    async def agenerate_response(self, prompt: str, context_docs: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Async variant of generate_response that does not block the event loop."""
+        try:
+            debug = logger.isEnabledFor(logging.DEBUG)
+            start_time = time.perf_counter() if debug else 0.0
+            
+            pieces = []
+            result = {}
+            async for chunk in self.astream_response(prompt, context_docs):
+                pieces.append(chunk.get("response", ""))
+                result = chunk  # The last chunk carries the token counts
+            
+            result["response"] = "".join(pieces)
+            if debug:
+                logger.debug(
+                    "Async generation took %.2fs (%s prompt / %s response tokens)",
+                    time.perf_counter() - start_time,
+                    result.get("prompt_eval_count", 0),
+                    result.get("eval_count", 0)
+                )
+            return self._format_result(result, context_docs)
+            
+        except httpx.HTTPStatusError as e:
+            logger.error(f"LLM request failed. Status: {e.response.status_code}")
+            self.invalidate_status_cache()
             return {
                 "success": False,
-                "error": str(e),
-                "response": "Sorry, I encountered an unexpected error. Please try again."
+                "error": f"HTTP {e.response.status_code}: {e.response.text}",
+                "response": "Sorry, I encountered an error while generating a response."
             }
+        except httpx.TimeoutException:
+            logger.error("LLM request timed out")
+            return self._timeout_result()
+        except Exception as e:
+            logger.error(f"Error generating LLM response: {e}")
+            return self._error_result(e)
+    
+    async def warmup(self) -> bool:
+        """Ask Ollama to load the model without generating anything."""
+        try:
+            response = await self.async_client.post(
+                "/api/generate",
+                content=orjson.dumps({"model": self.model, "prompt": "", "keep_alive": self.config.OLLAMA_KEEP_ALIVE, "stream": False}),
+                headers=JSON_HEADERS
+            )
+            return response.status_code == 200
+        except Exception as e:
+            logger.warning(f"Model warmup failed: {e}")
+            return False
+    
+    async def is_model_loaded(self) -> bool:
+        """Check whether the model is currently resident in Ollama's memory."""
+        try:
+            response = await self.async_client.get("/api/ps")
+            if response.status_code != 200:
+                return False
+            loaded = orjson.loads(response.content).get("models", [])
+            return any(model.get("name", "").split(":")[0] == self.model.split(":")[0] for model in loaded)
+        except Exception as e:
+            logger.warning(f"Could not query loaded models: {e}")
+            return False
+    
+    async def generate_batch(self, prompts: List[str],
+                             contexts: Optional[List[Optional[List[Dict]]]] = None) -> List[Dict[str, Any]]:
+        """Generate responses for a batch of prompts concurrently over one connection pool.
+        
+        At most LLM_BATCH_CONCURRENCY requests are in flight at once, so a large
+        batch reuses a few pooled connections instead of opening one per prompt.
+        """
+        if contexts is None:
+            contexts = [None] * len(prompts)
+        semaphore = asyncio.Semaphore(self.config.LLM_BATCH_CONCURRENCY)
+        
+        async def generate_one(prompt: str, context_docs: Optional[List[Dict]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.agenerate_response(prompt, context_docs)
+        
+        return await asyncio.gather(*[
+            generate_one(prompt, context_docs)
+            for prompt, context_docs in zip(prompts, contexts)
+        ])
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Lazily created HTTP client shared by all async calls."""
+        if self._async_client is None:
+            self._async_client = create_async_client(self.base_url)
+            self._owns_async_client = True
+        return self._async_client
+    
+    async def aclose(self):
+        """Close the async HTTP client if this handler created it."""
+        if self._async_client is not None and self._owns_async_client:
+            await self._async_client.aclose()
+        self._async_client = None
+    
+    def _build_payload(self, prompt: str, context_docs: Optional[List[Dict]] = None, stream: bool = False) -> Dict[str, Any]:
+        """Build the Ollama chat payload for a prompt and optional context."""
+        # Debug logging (hot path: skip the work entirely when INFO is disabled)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Context docs provided: %s", context_docs is not None)
+            logger.info("Number of context docs: %d", len(context_docs) if context_docs else 0)
+            if not context_docs:
+                logger.info("Using GENERAL CHAT mode - no documents")
+        
+        messages = self._build_messages(prompt, context_docs)
+        
+        # Prepare request payload with optimized settings for speed
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.config.OLLAMA_KEEP_ALIVE,
+            "options": self._request_options(self._prefix_tokens(messages[0]["content"]))
+        }
+    
+    def _build_base_options(self) -> Dict[str, Any]:
+        """Generation options shared by every request."""
+        temperature = self.config.LLM_TEMPERATURE
+        options = {
+            "temperature": temperature,
+            "top_p": 0.9,
+            "num_predict": 256,  # Reduced for faster responses
+            "num_ctx": 2048,     # Context window
+            "num_batch": self.config.OLLAMA_NUM_BATCH,
+            "num_gpu": self.config.OLLAMA_NUM_GPU,  # Fixed layer offload so the model is never re-split
+            "stop": ("User:", "Human:"),
+            "repeat_penalty": 1.1,
+            "seed": self.config.LLM_SEED if temperature == 0 else -1,  # Fixed seed makes greedy runs repeatable
+            "tfs_z": 1.0,
+            "typical_p": 1.0,
+            "presence_penalty": 0.0,
+            "frequency_penalty": 0.0,
+            "mirostat": 0,
+            "mirostat_tau": 5.0,
+            "mirostat_eta": 0.1,
+            "penalize_newline": True,
+            "numa": False
+        }
+        if self.config.OLLAMA_NUM_THREAD:
+            options["num_thread"] = self.config.OLLAMA_NUM_THREAD
+        return options
+    
+    def _request_options(self, num_keep: int) -> Dict[str, Any]:
+        """Options for a request, shared by every request with the same prefix length (do not mutate)."""
+        options = self._options_by_keep.get(num_keep)
+        if options is None:
+            # num_keep holds the stable system prefix in place on context shifts
+            options = {**self._base_options, "num_keep": num_keep}
+            self._options_by_keep[num_keep] = options
+        return options
+    
+    @staticmethod
+    def _chat_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Expose a /api/chat chunk's message text under "response", as /api/generate did."""
+        chunk["response"] = chunk.get("message", {}).get("content", "")
+        return chunk
+    
+    def _format_result(self, result: Dict[str, Any], context_docs: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Convert a raw Ollama generate result into the handler's response dict."""
+        return {
+            "success": True,
+            "response": TRAILING_ROLE_RE.sub("", result.get("response", "")).strip(),
+            "model": self.model,
+            "context_used": len(context_docs) if context_docs else 0,
+            "prompt_tokens": result.get("prompt_eval_count", 0),
+            "response_tokens": result.get("eval_count", 0)
+        }
+    
+    def _timeout_result(self) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": "Request timed out",
+            "response": "Sorry, the request took too long to process. Please try again."
+        }
+    
+    def _error_result(self, error: Exception) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": str(error),
+            "response": "Sorry, I encountered an unexpected error. Please try again."
+        }
     
-    def _build_context_prompt(self, user_query: str, context_docs: Optional[List[Dict]] = None) -> str:
-        """Build an enhanced prompt with relevant document context."""
+    @staticmethod
+    def _stable_docs(context_docs: List[Dict]) -> List[Dict]:
+        """Top documents, deduplicated and in a fixed order, so the same set always yields the same prefix."""
+        # Duplicate chunks collapse to their best-scoring copy
+        unique = {}
+        for doc in context_docs:
+            key = doc.get("id") or hashlib.blake2b(doc.get("content", "").encode("utf-8"), digest_size=16).hexdigest()
+            if key not in unique or _doc_score(doc) > _doc_score(unique[key]):
+                unique[key] = doc
         
+        # True top documents by score (ties keep retrieval order), then ordered by key
+        top = heapq.nlargest(MAX_CONTEXT_DOCS, unique.items(), key=lambda item: _doc_score(item[1]))
+        return [doc for _key, doc in sorted(top, key=lambda item: item[0])]
+    
+    def _build_document_system(self, context_docs: List[Dict]) -> str:
+        """Build the system message for document chat; it does not depend on the question."""
+        # Build context from retrieved documents (limit and truncate for speed)
+        context_text = "".join(
+            f"{i}. {truncate_tokens(doc.get('content', ''), self._doc_token_budget)}\n"
+            for i, doc in enumerate(self._stable_docs(context_docs), 1)
+        )
+        return DOCUMENT_SYSTEM.substitute(context=context_text)
+    
+    def _context_doc_budget(self) -> int:
+        """Tokens each context document may use so the full prompt always fits in num_ctx."""
+        instructions = self._prefix_tokens(DOCUMENT_SYSTEM.substitute(context=""))
+        free = (self._base_options["num_ctx"] - self._base_options["num_predict"]
+                - instructions - PROMPT_HEADROOM_TOKENS)
+        return max(1, min(self.config.CONTEXT_DOC_TOKENS, free // MAX_CONTEXT_DOCS))
+    
+    def _prefix_tokens(self, system_prompt: str) -> int:
+        """Approximate token count of the system prefix, memoized per distinct prefix."""
+        key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        count = self._prefix_token_counts.get(key)
+        if count is None:
+            count = estimate_tokens(system_prompt)
+            if len(self._prefix_token_counts) >= MAX_PREFIX_COUNTS:
+                self._prefix_token_counts.clear()
+            self._prefix_token_counts[key] = count
+        return count
+    
+    def _build_messages(self, user_query: str, context_docs: Optional[List[Dict]] = None) -> List[Dict[str, str]]:
+        """Build chat messages with relevant document context in the system message."""
         if not context_docs:
             # General Chat Mode - Simple and fast prompt
-            return f"You are a helpful AI assistant. Answer concisely.\n\nUser: {user_query}\nAssistant:"
+            system_prompt = GENERAL_SYSTEM
         else:
             # Document Chat Mode - Context provided
-            system_prompt = "You are an AI assistant that answers questions based on provided documents. Be concise and reference the documents when relevant."
-            
-            # Build context from retrieved documents (limit for speed)
-            context_text = "\n\nRelevant information:\n"
-            for i, doc in enumerate(context_docs[:3], 1):  # Limit to top 3 for speed
-                content = doc.get("content", "")[:500]  # Truncate for speed
-                context_text += f"{i}. {content}\n"
-            
-            return f"{system_prompt}\n{context_text}\nUser Question: {user_query}\nAssistant:"
+            system_prompt = self._build_document_system(context_docs)
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_query}
+        ]
     
     def check_model_availability(self) -> Dict[str, Any]:
         """Check available models and current model status."""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                models_data = response.json().get("models", [])
-                available_models = [model["name"] for model in models_data]
-                
-                return {
-                    "available": True,
-                    "current_model": self.model,
-                    "available_models": available_models,
-                    "model_loaded": self.model in [m.split(":")[0] for m in available_models]
-                }
-            else:
-                return {
-                    "available": False,
-                    "error": f"HTTP {response.status_code}",
-                    "current_model": self.model
-                }
+            return self._model_status_result(*self._fetch_tags())
+        except Exception as e:
+            return self._model_status_error(e)
+    
+    async def acheck_model_availability(self) -> Dict[str, Any]:
+        """Async variant of check_model_availability over the pooled client."""
+        try:
+            return self._model_status_result(*await self._afetch_tags())
         except Exception as e:
+            return self._model_status_error(e)
+    
+    def _fetch_tags(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Return (status code, parsed body) of /api/tags, served from memory for a short while."""
+        cached = _tags_cache.get(self.base_url)
+        if cached is not None and cached[0] > time.monotonic():
+            return 200, cached[1]
+        
+        response = self._http.request("GET", f"{self.base_url}/api/tags", timeout=5.0)
+        _log_transfer("/api/tags", response.headers, response.data)
+        return self._store_tags(response.status, response.data)
+    
+    async def _afetch_tags(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Async variant of _fetch_tags; both share the same cache."""
+        cached = _tags_cache.get(self.base_url)
+        if cached is not None and cached[0] > time.monotonic():
+            return 200, cached[1]
+        
+        response = await self.async_client.get("/api/tags", timeout=5)
+        _log_transfer("/api/tags", response.headers, response.content)
+        return self._store_tags(response.status_code, response.content)
+    
+    def _store_tags(self, status_code: int, content: bytes) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Parse an /api/tags body and cache it; failures are never cached so recovery shows at once."""
+        if status_code != 200:
+            return status_code, None
+        
+        tags = orjson.loads(content)
+        _tags_cache[self.base_url] = (time.monotonic() + self.config.OLLAMA_STATUS_TTL_SECONDS, tags)
+        return status_code, tags
+    
+    def invalidate_status_cache(self):
+        """Forget the cached model list, e.g. after Ollama rejected a request."""
+        _tags_cache.pop(self.base_url, None)
+    
+    def _model_status_result(self, status_code: int, tags: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the model status dict from an /api/tags response."""
+        if status_code != 200:
             return {
                 "available": False,
-                "error": str(e),
+                "error": f"HTTP {status_code}",
                 "current_model": self.model
             }
+        
+        available_models = [model["name"] for model in tags.get("models", [])]
+        return {
+            "available": True,
+            "current_model": self.model,
+            "available_models": available_models,
+            "model_loaded": self.model in [m.split(":")[0] for m in available_models]
+        }
+    
+    def _model_status_error(self, error: Exception) -> Dict[str, Any]:
+        return {
+            "available": False,
+            "error": str(error),
+            "current_model": self.model
+        }
     
     def get_model_info(self) -> Dict[str, Any]:
         """Get detailed information about the current model."""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/show",
-                json={"name": self.model},
+                data=orjson.dumps({"name": self.model}),
+                headers=JSON_HEADERS,
                 timeout=10
             )
             
             if response.status_code == 200:
-                return response.json()
+                _log_transfer("/api/show", response.headers, response.content)
+                return orjson.loads(response.content)
+            else:
+                return {"error": f"HTTP {response.status_code}"}
+        except Exception as e:
+            return {"error": str(e)}
+    
+    async def aget_model_info(self) -> Dict[str, Any]:
+        """Async variant of get_model_info."""
+        try:
+            response = await self.async_client.post("/api/show", content=orjson.dumps({"name": self.model}), headers=JSON_HEADERS, timeout=10)
+            
+            if response.status_code == 200:
+                _log_transfer("/api/show", response.headers, response.content)
+                return orjson.loads(response.content)
             else:
                 return {"error": f"HTTP {response.status_code}"}
         except Exception as e:
@@ -210,3 +696,21 @@ class OfflineLLM:
                 "message": f"Connection test failed: {str(e)}",
                 "error": str(e)
             }
+    
+    async def atest_connection(self) -> Dict[str, Any]:
+        """Async variant of test_connection that does not block the event loop."""
+        model_status = await self.acheck_model_availability()
+        if not model_status.get("available"):
+            return {
+                "success": False,
+                "message": "Cannot connect to Ollama. Please ensure Ollama is running.",
+                "error": model_status.get("error")
+            }
+        
+        test_response = await self.agenerate_response("Hello")
+        return {
+            "success": test_response["success"],
+            "message": "Connection successful!" if test_response["success"] else "Connection failed",
+            "model_response": test_response.get("response", ""),
+            "error": test_response.get("error")
+        }
@@ -2,7 +2,7 @@ import logging
 import requests
 import json
 from typing import List, Dict, Any, Optional
-from config import Config
+from config import settings
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -12,7 +12,7 @@ class OfflineLLM:
     """Handles communication with local LLM via Ollama."""
     
     def __init__(self):
-        self.config = Config()
+        self.config = settings
         self.base_url = self.config.get_ollama_url()
         self.model = self.config.LLM_MODEL
         self._check_ollama_connection()
@@ -5,12 +5,29 @@ Creates a fine-tuned model using Ollama Modelfile approach
 """
 
 import os
-import json
-from typing import List, Dict
+from itertools import islice
+import orjson
+try:
+    import ijson  # Incremental JSON parser, so large training files are never fully loaded
+except ImportError:
+    ijson = None
+from typing import List, Dict, Optional
+
+def _modelfile_text(text: str, field: str) -> str:
+    """Check text can sit inside a Modelfile triple-quoted value.
+    
+    Ollama takes everything up to the closing triple quote verbatim (no escape
+    sequences), so the text itself must not contain or end in a quote run.
+    """
+    if '"""' in text or text.endswith('"'):
+        raise ValueError(f"Modelfile {field} cannot contain triple quotes or end with a quote: {text[:60]!r}")
+    return text
 
 class ModelTrainer:
     """Helper class for creating custom models with Ollama."""
     
+    FEW_SHOT_EXAMPLES = 5  # Training examples written into the Modelfile
+    
     def __init__(self, base_model: str = "llama3.1:8b"):
         self.base_model = base_model
         self.training_data = []
@@ -22,11 +39,14 @@ class ModelTrainer:
             "response": response
         })
     
-    def load_training_data(self, file_path: str):
-        """Load training data from JSON file."""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for item in data:
+    def load_training_data(self, file_path: str, limit: Optional[int] = None):
+        """Load training data from JSON file, stopping after `limit` examples if given.
+        
+        Pass limit=ModelTrainer.FEW_SHOT_EXAMPLES when only building a Modelfile.
+        """
+        with open(file_path, 'rb') as f:
+            items = ijson.items(f, 'item') if ijson is not None else orjson.loads(f.read())
+            for item in islice(items, limit):
                 self.add_training_example(
                     item.get("instruction", ""),
                     item.get("response", "")
@@ -40,7 +60,7 @@ class ModelTrainer:
 Provide accurate, helpful responses based on your training. 
 If you're unsure about something, say so honestly."""
         
-        modelfile_content = f"""FROM {self.base_model}
+        header = f"""FROM {self.base_model}
 
 # Custom parameters
 PARAMETER temperature 0.7
@@ -55,21 +75,27 @@ TEMPLATE \"\"\"### Instruction:
 \"\"\"
 
 # System message
-SYSTEM \"\"\"{system_prompt}\"\"\"
+SYSTEM \"\"\"{_modelfile_text(system_prompt, "system prompt")}\"\"\"
 
 # Training examples (few-shot learning)
 """
         
-        # Add training examples as few-shot prompts
-        for i, example in enumerate(self.training_data[:5]):  # Use first 5 as examples
-            modelfile_content += f"""
-MESSAGE user "{example['instruction']}"
-MESSAGE assistant "{example['response']}"
-"""
+        # Validate every example before writing, so a bad one never leaves a partial file
+        messages = [
+            (_modelfile_text(example['instruction'], "instruction"), _modelfile_text(example['response'], "response"))
+            for example in self.training_data[:self.FEW_SHOT_EXAMPLES]
+        ]
         
-        # Save Modelfile
+        # Save Modelfile, streaming the training examples in as few-shot prompts
         with open(f"Modelfile-{custom_model_name}", 'w', encoding='utf-8') as f:
-            f.write(modelfile_content)
+            f.write(header)
+            f.writelines(
+                f"""
+MESSAGE user \"\"\"{instruction}\"\"\"
+MESSAGE assistant \"\"\"{response}\"\"\"
+"""
+                for instruction, response in messages
+            )
         
         print(f"✅ Modelfile created: Modelfile-{custom_model_name}")
         print(f"📋 Next steps:")
@@ -0,0 +1,149 @@
+import os
+import json
+import logging
+from typing import List
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def calibrate(embeddings: np.ndarray) -> np.ndarray:
+    """Per-dimension (min, max) ranges used to quantize embeddings to int8."""
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    return np.stack([embeddings.min(axis=0), embeddings.max(axis=0)])
+
+def quantize(vectors: np.ndarray, ranges: np.ndarray) -> np.ndarray:
+    """Quantize float vectors to int8 over calibrated per-dimension ranges.
+
+    Same scheme as sentence_transformers' quantize_embeddings(precision="int8"):
+    each dimension's [min, max] is split into 256 buckets.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    starts, steps = ranges[0], _steps(ranges)
+    return np.clip(np.round((vectors - starts) / steps) - 128, -128, 127).astype(np.int8)
+
+def unit_ranges(dim: int) -> np.ndarray:
+    """Fixed [-1, 1] ranges, valid for any L2-normalized embedding."""
+    return np.stack([np.full(dim, -1.0, dtype=np.float32), np.full(dim, 1.0, dtype=np.float32)])
+
+def _steps(ranges: np.ndarray) -> np.ndarray:
+    """Bucket width per dimension, guarding against constant dimensions."""
+    steps = (ranges[1] - ranges[0]) / 255
+    steps[steps == 0] = 1.0
+    return steps
+
+class Int8Index:
+    """Brute-force int8 vector index persisted next to ChromaDB.
+
+    Holds a (N, dim) int8 matrix, 4x smaller than the float32 vectors Chroma
+    keeps, quantized over per-dimension ranges calibrated on the first vectors
+    added (or fixed unit ranges while there are too few to calibrate on). It is used to shortlist candidates; Chroma remains the source of truth
+    for documents, metadata and full-precision embeddings.
+    """
+
+    BLOCK_ROWS = 8192  # Rows widened to int32 at a time while scoring
+    MIN_CALIBRATION_ROWS = 256  # Smaller first batches use the fixed unit ranges instead
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._vectors_path = os.path.join(directory, "vectors.npy")
+        self._ranges_path = os.path.join(directory, "ranges.npy")
+        self._ids_path = os.path.join(directory, "ids.json")
+        self._load()
+
+    def _load(self):
+        """Load the index from disk, memory-mapping the vector matrix."""
+        self.ids: List[str] = []
+        self.vectors = None
+        self.ranges = None
+        
+        if not os.path.exists(self._ids_path) or not os.path.exists(self._ranges_path):
+            return
+        
+        try:
+            with open(self._ids_path, "r", encoding="utf-8") as f:
+                self.ids = json.load(f)
+            self.vectors = np.load(self._vectors_path, mmap_mode="r")
+            self.ranges = np.load(self._ranges_path)
+        except Exception as e:
+            logger.error(f"Failed to load int8 index, starting empty: {e}")
+            self.ids, self.vectors, self.ranges = [], None, None
+    
+    def _save(self):
+        """Persist the index to disk."""
+        os.makedirs(self.directory, exist_ok=True)
+        
+        # Write to temp files and swap in, so a live memory map is never truncated
+        for path, array in ((self._vectors_path, self.vectors), (self._ranges_path, self.ranges)):
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(path + ".tmp", path)
+        
+        with open(self._ids_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        os.replace(self._ids_path + ".tmp", self._ids_path)
+    
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        """Quantize and append embeddings for the given ids."""
+        if not ids:
+            return
+        
+        # The first batch fixes the quantization ranges; later outliers are clipped.
+        # A handful of vectors gives degenerate ranges, so small batches start on
+        # the unit ranges until the index is large enough to recalibrate.
+        if self.ranges is None or len(self.ids) == 0:
+            embeddings = np.atleast_2d(embeddings)
+            if len(embeddings) >= self.MIN_CALIBRATION_ROWS:
+                self.ranges = calibrate(embeddings)
+            else:
+                self.ranges = unit_ranges(embeddings.shape[1])
+        
+        quantized = quantize(embeddings, self.ranges)
+        if self.vectors is None or len(self.ids) == 0:
+            self.vectors = quantized
+        else:
+            self.vectors = np.concatenate([np.asarray(self.vectors), quantized])
+        self.ids.extend(ids)
+        self._save()
+    
+    @property
+    def needs_calibration(self) -> bool:
+        """True once the index outgrew the unit ranges it started on and should be rebuilt."""
+        return (
+            len(self.ids) >= self.MIN_CALIBRATION_ROWS
+            and self.ranges is not None
+            and np.array_equal(self.ranges, unit_ranges(self.ranges.shape[1]))
+        )
+    
+    def search(self, query_embedding: np.ndarray, k: int) -> List[str]:
+        """Return the ids of the k rows with the highest approximate dot product."""
+        if not self.ids or k <= 0:
+            return []
+        
+        # x ~= start + step * (q + 128), so ranking by x . query only needs (step * query) . q
+        weights = np.asarray(query_embedding, dtype=np.float32).ravel() * _steps(self.ranges)
+        weight_scale = np.max(np.abs(weights)) / 127 or 1.0
+        weights_q = np.round(weights / weight_scale).astype(np.int32)
+        
+        # int8 products overflow int16 over 384 dims, so accumulate in int32 block by block
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), self.BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + self.BLOCK_ROWS], dtype=np.int32)
+            scores[start:start + len(block)] = block @ weights_q
+        
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.ids[i] for i in top]
+    
+    def clear(self):
+        """Remove every vector from the index."""
+        self.ids, self.vectors, self.ranges = [], None, None
+        for path in (self._vectors_path, self._ranges_path, self._ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
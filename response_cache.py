@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from config import settings
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Two-tier cache for chat responses: exact-match LRU plus semantic lookup."""
+
+    SCHEMA_VERSION = 3  # Bump when the SQLite layout changes; older files are discarded
+
+    def __init__(self, max_size: int = None, ttl_seconds: float = None, similarity_threshold: float = None,
+                 db_path: Optional[str] = None):
+        self.config = settings
+        self.max_size = max_size or self.config.RESPONSE_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds or self.config.RESPONSE_CACHE_TTL_SECONDS
+        self.similarity_threshold = similarity_threshold or self.config.RESPONSE_CACHE_SIMILARITY
+        self.embedding_model = self.config.EMBEDDING_MODEL
+
+        # Layer 1: key -> (expires_at, mode, payload), ordered by recency
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+
+        # Layer 2: one L2-normalized embedding row per cached key
+        self._vector_keys: List[str] = []
+        self._vector_modes: List[str] = []
+        self._vectors: Optional[np.ndarray] = None
+        
+        # Optional SQLite write-through copy, so a restart starts warm
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._open_db(db_path)
+
+    @staticmethod
+    def make_key(mode: str, message: str) -> str:
+        """Build the exact-match cache key for a chat request."""
+        normalized = mode + "\x00" + message.strip().lower()
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached payload for an exact key, or None on miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _mode, payload = entry
+        if expires_at < time.time():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return payload
+
+    def get_similar(self, mode: str, embedding: np.ndarray) -> Optional[Any]:
+        """Return the payload of the most similar cached query in the same mode."""
+        if self._vectors is None or not self._vector_keys:
+            return None
+
+        query = self._normalize(embedding)
+        if query.shape[0] != self._vectors.shape[1]:
+            return None
+        scores = self._vectors @ query
+
+        # Only compare against queries asked in the same chat mode
+        mode_mask = np.fromiter((m == mode for m in self._vector_modes), dtype=bool, count=len(self._vector_modes))
+        scores = np.where(mode_mask, scores, -1.0)
+
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        logger.info(f"Semantic cache hit (similarity {scores[best]:.3f})")
+        return self.get(self._vector_keys[best])
+
+    def put(self, key: str, mode: str, payload: Any, embedding: Optional[np.ndarray] = None):
+        """Store a payload under its exact key and, optionally, its query embedding.
+
+        Payloads must be JSON-serializable (plain dicts, lists and scalars) so they can be persisted.
+        """
+        if key in self._entries:
+            self._remove(key)
+
+        expires_at = time.time() + self.ttl_seconds
+        self._entries[key] = (expires_at, mode, payload)
+
+        vector = None
+        if embedding is not None:
+            vector = self._normalize(embedding)
+            self._add_vector(key, mode, vector)
+
+        if self._db is not None:
+            self._persist(key, mode, payload, expires_at, vector)
+
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+    def invalidate(self, mode: Optional[str] = None):
+        """Drop cached entries for a chat mode, or everything when mode is None."""
+        if mode is None:
+            self._entries.clear()
+            self._vector_keys, self._vector_modes, self._vectors = [], [], None
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+            return
+
+        stale_keys = [key for key, (_, entry_mode, _) in self._entries.items() if entry_mode == mode]
+        for key in stale_keys:
+            self._remove(key)
+
+        if stale_keys:
+            logger.info(f"Invalidated {len(stale_keys)} cached '{mode}' responses")
+
+    def _remove(self, key: str):
+        """Remove a key from both cache layers."""
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+        if key in self._vector_keys:
+            index = self._vector_keys.index(key)
+            del self._vector_keys[index]
+            del self._vector_modes[index]
+            self._vectors = np.delete(self._vectors, index, axis=0)
+
+    def _add_vector(self, key: str, mode: str, vector: np.ndarray):
+        """Append a normalized embedding row to the semantic layer."""
+        if self._vectors is not None and vector.shape[0] != self._vectors.shape[1]:
+            logger.warning(f"Skipping {vector.shape[0]}-d embedding in a {self._vectors.shape[1]}-d semantic cache")
+            return
+        row = vector[np.newaxis, :]
+        self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+        self._vector_keys.append(key)
+        self._vector_modes.append(mode)
+
+    def _open_db(self, db_path: str):
+        """Open (or create) the SQLite copy of the cache and load its live entries."""
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit plus WAL: each put is one small durable write that never blocks readers
+        self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS responses")
+            self._db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, mode TEXT NOT NULL, payload BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, stored_at REAL NOT NULL, "
+            "embedding BLOB, embedding_model TEXT, embedding_dim INTEGER)"
+        )
+        self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+
+        rows = self._db.execute(
+            "SELECT key, mode, payload, expires_at, embedding, embedding_model, embedding_dim "
+            "FROM responses ORDER BY stored_at DESC LIMIT ?",
+            (self.max_size,)
+        ).fetchall()
+
+        # Oldest first, so the in-memory LRU order matches insertion order on disk
+        vectors = []
+        for key, mode, payload, expires_at, embedding, embedding_model, embedding_dim in reversed(rows):
+            try:
+                self._entries[key] = (expires_at, mode, orjson.loads(payload))
+            except Exception as e:
+                logger.warning(f"Dropping unreadable cached response {key[:12]}: {e}")
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                continue
+            # Vectors from another embedding model are not comparable; keep only the exact entry
+            if embedding is not None and embedding_model == self.embedding_model:
+                if vectors and embedding_dim != len(vectors[0]):
+                    continue
+                vectors.append(np.frombuffer(embedding, dtype=np.float32))
+                self._vector_keys.append(key)
+                self._vector_modes.append(mode)
+
+        if vectors:
+            self._vectors = np.vstack(vectors)
+        if self._entries:
+            logger.info(f"Loaded {len(self._entries)} cached responses from {db_path}")
+
+    def _persist(self, key: str, mode: str, payload: Any, expires_at: float, vector: Optional[np.ndarray]):
+        """Write one entry through to SQLite; a failure only costs the warm start."""
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, mode, payload, expires_at, stored_at, embedding, embedding_model, embedding_dim) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, mode, orjson.dumps(payload), expires_at, time.time(),
+                 vector.astype(np.float32).tobytes() if vector is not None else None,
+                 self.embedding_model if vector is not None else None,
+                 vector.shape[0] if vector is not None else None)
+            )
+        except Exception as e:
+            logger.warning(f"Could not persist cached response: {e}")
+
+    def close(self):
+        """Close the SQLite copy, if any."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """L2-normalize an embedding so the dot product equals cosine similarity."""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def __len__(self) -> int:
+        return len(self._entries)
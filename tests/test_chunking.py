@@ -0,0 +1,39 @@
+import random
+
+from chunking import add_overlap, overlap_tail
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+def _pieces(word_count: int, piece_size: int, seed: int = 0):
+    """Cut random words into pieces of at most piece_size chars, like a non-overlapping chunker."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 9))) for _ in range(word_count)]
+    pieces, current = [], ""
+    for word in words:
+        if current and len(current) + 1 + len(word) > piece_size:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    pieces.append(current)
+    return pieces
+
+def test_adjacent_chunks_share_about_chunk_overlap_chars():
+    pieces = _pieces(5000, CHUNK_SIZE - CHUNK_OVERLAP)
+    chunks = add_overlap(pieces, CHUNK_OVERLAP)
+
+    assert len(chunks) == len(pieces)
+    for previous, piece, chunk in zip(pieces, pieces[1:], chunks[1:]):
+        assert chunk.endswith(" " + piece)
+        shared = chunk[:len(chunk) - len(piece) - 1]
+        assert previous.endswith(shared)
+        assert CHUNK_OVERLAP - 12 <= len(shared) + 1 <= CHUNK_OVERLAP
+        assert len(chunk) <= CHUNK_SIZE
+
+def test_overlap_tail_never_starts_mid_word():
+    assert overlap_tail("hello brave new world", 12) == "new world"
+    assert overlap_tail("hello brave new world", 10) == "new world"
+    assert overlap_tail("abcdefgh", 3) == ""
+    assert overlap_tail("short", 10) == "short"
+    assert overlap_tail("anything", 0) == ""
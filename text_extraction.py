@@ -0,0 +1,116 @@
+import hashlib
+import logging
+from pathlib import Path
+import PyPDF2
+from docx import Document
+try:
+    import pypdfium2 as pdfium  # PDFium bindings, much faster than pure-Python PyPDF2
+except ImportError:
+    pdfium = None
+try:
+    import diskcache  # Extracted-text cache, safe to share between worker processes
+except ImportError:
+    diskcache = None
+
+from config import settings
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Module-level functions so they can be shipped to worker processes. This module
+# deliberately avoids importing the embedding/vector stack to keep workers light.
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """Extract text from PDF file."""
+    if pdfium is not None:
+        try:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                return "\n".join(page.get_textpage().get_text_range() for page in pdf).strip()
+            finally:
+                pdf.close()
+        except Exception as e:
+            logger.warning(f"PDFium could not read {file_path}, falling back to PyPDF2: {e}")
+    
+    return _extract_text_from_pdf_pypdf2(file_path)
+
+def _extract_text_from_pdf_pypdf2(file_path: str) -> str:
+    """Extract text from PDF file with PyPDF2 (fallback for malformed PDFs)."""
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            return "\n".join(page.extract_text() for page in pdf_reader.pages).strip()
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF {file_path}: {e}")
+        return ""
+
+def extract_text_from_docx(file_path: str) -> str:
+    """Extract text from DOCX file."""
+    try:
+        doc = Document(file_path)
+        return "\n".join(paragraph.text for paragraph in doc.paragraphs).strip()
+    except Exception as e:
+        logger.error(f"Error extracting text from DOCX {file_path}: {e}")
+        return ""
+
+def extract_text_from_txt(file_path: str) -> str:
+    """Extract text from TXT file."""
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+            return file.read().strip()
+    except Exception as e:
+        logger.error(f"Error extracting text from TXT {file_path}: {e}")
+        return ""
+
+def extract_text_from_file(file_path: str) -> str:
+    """Extract text from supported file formats."""
+    file_extension = Path(file_path).suffix.lower()
+
+    if file_extension == '.pdf':
+        return extract_text_from_pdf(file_path)
+    elif file_extension == '.docx':
+        return extract_text_from_docx(file_path)
+    elif file_extension == '.txt':
+        return extract_text_from_txt(file_path)
+    else:
+        logger.warning(f"Unsupported file format: {file_extension}")
+        return ""
+
+_extract_cache = None
+
+def _get_extract_cache():
+    """Open the on-disk extracted-text cache lazily, once per process."""
+    global _extract_cache
+    if _extract_cache is None and diskcache is not None and settings.EXTRACT_CACHE_PATH:
+        _extract_cache = diskcache.Cache(
+            settings.EXTRACT_CACHE_PATH,
+            size_limit=settings.EXTRACT_CACHE_SIZE_MB * 1024 * 1024
+        )
+    return _extract_cache
+
+def extract_text_cached(file_path: str, content_hash: str) -> str:
+    """Extract text from a file, reusing the result for content that was extracted before."""
+    cache = _get_extract_cache()
+    if cache is None:
+        return extract_text_from_file(file_path)
+    
+    # Keyed by content rather than path: uploads land in a fresh temp directory every time
+    key = f"{content_hash}{Path(file_path).suffix.lower()}"
+    text = cache.get(key)
+    if text is not None:
+        logger.info(f"Using cached text for {file_path}")
+        return text
+    
+    text = extract_text_from_file(file_path)
+    if text:
+        cache.set(key, text)
+    return text
+
+def file_content_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Compute the blake2b hex digest of a file without loading it into memory."""
+    content_hash = hashlib.blake2b()
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()